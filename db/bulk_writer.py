@@ -0,0 +1,199 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pymongo.errors import BulkWriteError, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# Operações acumuladas por coleção antes de um bulk_write
+BATCH_SIZE = int(os.getenv('BULK_WRITE_BATCH_SIZE', 1000))
+# Tempo máximo (s) que uma operação espera na fila antes de ser gravada
+MAX_LATENCY = float(os.getenv('BULK_WRITE_MAX_LATENCY', 2.0))
+# Lotes aguardando o escritor; com a fila cheia, quem produz operações espera
+MAX_PENDING = int(os.getenv('BULK_WRITE_MAX_PENDING', 64))
+
+_STOP = object()
+
+
+class BulkWriter:
+    """
+    Fila de escrita (write-behind) para o MongoDB usada pelos scrapers assíncronos.
+
+    As operações entram em uma fila asyncio limitada e são agrupadas por coleção; cada grupo é
+    gravado quando atinge `batch_size` operações ou quando a operação mais antiga esperou
+    `max_latency` segundos. Os bulk_write síncronos do pymongo rodam em uma única thread
+    escritora, então o event loop continua buscando páginas enquanto o banco grava. Se o banco
+    ficar para trás, a fila enche e `put` passa a esperar, limitando a memória usada.
+
+    Operações enviadas com um `tag` (ex.: o usuário a que pertencem) que falharem deixam o tag
+    em `failed_tags`, devolvido também por `flush`, para que quem produz as operações saiba o
+    que não foi gravado.
+
+    Uso:
+        async with BulkWriter() as writer:
+            await writer.put(db.ratings, operations)
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, max_latency=MAX_LATENCY, max_pending=MAX_PENDING):
+        self.batch_size = batch_size
+        self.max_latency = max_latency
+        self._queue = asyncio.Queue(maxsize=max_pending)
+        self._buffers = {}
+        self._executor = None
+        self._task = None
+        self._lock = threading.Lock()
+        self._stats = {"operations": 0, "batches": 0, "errors": 0, "write_seconds": 0.0}
+        self._failed_tags = set()
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def start(self):
+        """Inicia a thread escritora e a tarefa que esvazia a fila."""
+        if self._task is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bulk-writer")
+            self._task = asyncio.ensure_future(self._drain())
+
+    async def put(self, collection, operations, tag=None):
+        """
+        Enfileira operações de escrita para a coleção. Espera apenas se a fila estiver cheia.
+
+        Parâmetros:
+            collection (Collection): Coleção de destino.
+            operations (list): Operações do pymongo (UpdateOne, ReplaceOne, ...).
+            tag (hashable): Identifica a origem das operações em `failed_tags` se alguma falhar (opcional).
+        """
+        operations = [op for op in operations if op is not None]
+        if not operations:
+            return
+        if self._task is None:
+            self.start()
+        if self._task.done():
+            raise RuntimeError("A fila de escrita do MongoDB não está mais ativa")
+        await self._queue.put((collection, operations, tag))
+
+    async def flush(self):
+        """
+        Espera até que todas as operações enfileiradas até agora tenham sido gravadas.
+
+        Retorna:
+            set: Tags de operações que falharam desde o início, como em `failed_tags`.
+        """
+        if self._task is not None and not self._task.done():
+            flushed = asyncio.get_running_loop().create_future()
+            await self._queue.put(flushed)
+            await flushed
+        return self.failed_tags()
+
+    async def close(self):
+        """Grava as operações pendentes e encerra a thread escritora."""
+        if self._task is None:
+            return
+        if not self._task.done():
+            await self._queue.put(_STOP)
+        try:
+            await self._task
+        finally:
+            self._executor.shutdown(wait=True)
+            self._task = None
+
+    def failed_tags(self):
+        """Tags de operações cujo bulk_write falhou."""
+        with self._lock:
+            return set(self._failed_tags)
+
+    def stats(self):
+        """Retorna o total de operações e lotes gravados, erros e o tempo gasto em escrita."""
+        with self._lock:
+            return dict(self._stats)
+
+    async def _drain(self):
+        loop = asyncio.get_running_loop()
+        deadline = None
+
+        while True:
+            timeout = None if deadline is None else max(deadline - loop.time(), 0)
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                # A operação mais antiga atingiu a latência máxima
+                await self._flush_all()
+                deadline = None
+                continue
+
+            if item is _STOP:
+                await self._flush_all()
+                return
+
+            if isinstance(item, asyncio.Future):
+                # Pedido de flush: grava tudo o que veio antes dele na fila
+                await self._flush_all()
+                deadline = None
+                item.set_result(None)
+                continue
+
+            collection, operations, tag = item
+            _, buffer, tags = self._buffers.setdefault(collection.full_name, (collection, [], []))
+            buffer.extend(operations)
+            tags.extend([tag] * len(operations))
+            if deadline is None:
+                deadline = loop.time() + self.max_latency
+
+            if len(buffer) >= self.batch_size:
+                await self._flush(collection.full_name, full_batches_only=True)
+                if not self._buffers:
+                    deadline = None
+
+    async def _flush_all(self):
+        for name in list(self._buffers):
+            await self._flush(name)
+
+    async def _flush(self, name, full_batches_only=False):
+        collection, operations, tags = self._buffers.pop(name)
+        loop = asyncio.get_running_loop()
+
+        end = len(operations)
+        if full_batches_only:
+            # O resto continua no buffer até completar um lote ou atingir a latência máxima
+            end -= end % self.batch_size
+            if end < len(operations):
+                self._buffers[name] = (collection, operations[end:], tags[end:])
+
+        for start in range(0, end, self.batch_size):
+            batch = slice(start, start + self.batch_size)
+            await loop.run_in_executor(self._executor, self._write, collection, operations[batch], tags[batch])
+
+    def _write(self, collection, operations, tags):
+        started = time.perf_counter()
+        failed = False
+        failed_tags = set()
+        try:
+            collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as bwe:
+            failed = True
+            write_errors = bwe.details.get('writeErrors', [])
+            if bwe.details.get('writeConcernErrors'):
+                # Sem confirmação da escrita, nenhuma operação do lote é considerada gravada
+                failed_tags.update(tags)
+            else:
+                failed_tags.update(tags[error['index']] for error in write_errors)
+            logger.warning(f"Erros no bulk_write em {collection.full_name}: {write_errors[:5]}")
+        except PyMongoError as e:
+            failed = True
+            failed_tags.update(tags)
+            logger.error(f"Falha no bulk_write de {len(operations)} operações em {collection.full_name}: {e}")
+        failed_tags.discard(None)
+
+        with self._lock:
+            self._failed_tags.update(failed_tags)
+            self._stats["operations"] += len(operations)
+            self._stats["batches"] += 1
+            self._stats["errors"] += failed
+            self._stats["write_seconds"] += time.perf_counter() - started
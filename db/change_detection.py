@@ -0,0 +1,68 @@
+import json
+import hashlib
+from pymongo import UpdateOne
+
+# Detecção de mudanças para os scrapers: só o que é novo ou mudou é enviado ao MongoDB.
+
+
+def content_hash(fields):
+    """Hash estável de um dicionário de campos, para comparar com o valor gravado no documento."""
+    return hashlib.sha1(json.dumps(fields, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def load_rating_snapshot(ratings_collection, username):
+    """
+    Carrega as avaliações já gravadas do usuário com uma única consulta projetada.
+
+    Retorna:
+        dict: rating_val por movie_id.
+    """
+    cursor = ratings_collection.find({"user_id": username}, {"_id": 0, "movie_id": 1, "rating_val": 1})
+    return {rating["movie_id"]: rating["rating_val"] for rating in cursor}
+
+
+def changed_rating_operations(username, ratings, snapshot):
+    """
+    Upserts apenas das avaliações novas ou com nota diferente da gravada.
+
+    Parâmetros:
+        username (str): Usuário das avaliações.
+        ratings (list): Pares (movie_id, rating_val).
+        snapshot (dict): Avaliações gravadas, de `load_rating_snapshot`.
+
+    Retorna:
+        tuple: (operações, movie_ids das avaliações que ainda não existiam).
+    """
+    operations = []
+    new_movie_ids = []
+    for movie_id, rating_val in ratings:
+        stored = snapshot.get(movie_id)
+        if stored == rating_val:
+            continue
+        if stored is None:
+            new_movie_ids.append(movie_id)
+        operations.append(
+            UpdateOne(
+                {"user_id": username, "movie_id": movie_id},
+                {"$set": {"movie_id": movie_id, "rating_val": rating_val, "user_id": username}},
+                upsert=True,
+            )
+        )
+    return operations, new_movie_ids
+
+
+def skeleton_movie_operations(movie_ids, seen=None):
+    """
+    Upserts do esqueleto ({"movie_id"}) dos filmes, um por filme.
+
+    `$setOnInsert` não altera filmes que já existem, e os movie_ids em `seen` (atualizado aqui)
+    são ignorados, o que evita repetir o mesmo filme no lote e ao longo da execução.
+    """
+    seen = set() if seen is None else seen
+    operations = []
+    for movie_id in movie_ids:
+        if movie_id in seen:
+            continue
+        seen.add(movie_id)
+        operations.append(UpdateOne({"movie_id": movie_id}, {"$setOnInsert": {"movie_id": movie_id}}, upsert=True))
+    return operations
@@ -0,0 +1,64 @@
+import sys
+import os
+
+# Adiciona o diretório raiz do projeto ao Python Path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from rq.job import JobStatus
+
+
+async def enqueue_async(async_conn, queue, job):
+    """
+    Enqueue a job without dependencies in one MULTI/EXEC on an asyncio connection.
+
+    The writes are queued by `Queue.enqueue_job` itself, which only writes when given a
+    pipeline, so the Redis layout is the one RQ produces.
+
+    Parameters:
+        async_conn (redis.asyncio.Redis): Async Redis connection.
+        queue (Queue): Queue the job is enqueued on.
+        job (Job): A job created with `queue.create_job`.
+
+    Returns:
+        Job: The enqueued job.
+    """
+    async with async_conn.pipeline(transaction=True) as pipe:
+        queue.enqueue_job(job, pipeline=pipe)
+        await pipe.execute()
+
+    return job
+
+
+async def enqueue_with_dependent_async(async_conn, queue, job, dependent_job):
+    """
+    Enqueue a job and a job that depends on it in one MULTI/EXEC on an asyncio connection.
+
+    Both jobs must come from `queue.create_job`, the second with `depends_on=job`. The first
+    job is queued by `Queue.enqueue_job` and the dependent job by the public Job methods
+    RQ's `Queue.setup_dependencies` uses, all of which only write when given a pipeline. The
+    dependency is created in the same transaction, so it can't have finished yet and the
+    dependent job is always deferred. That is why RQ's WATCH on the dependency is not needed
+    here.
+
+    Parameters:
+        async_conn (redis.asyncio.Redis): Async Redis connection.
+        queue (Queue): Queue the jobs are enqueued on.
+        job (Job): The job to run first.
+        dependent_job (Job): The job to run once `job` has finished.
+
+    Returns:
+        tuple: The enqueued job and dependent job.
+    """
+    async with async_conn.pipeline(transaction=True) as pipe:
+        # Starts the MULTI, so it has to come before any other command
+        queue.enqueue_job(job, pipeline=pipe)
+
+        dependent_job.origin = queue.name
+        dependent_job.set_status(JobStatus.DEFERRED, pipeline=pipe)
+        dependent_job.register_dependency(pipeline=pipe)
+        dependent_job.save(pipeline=pipe)
+        dependent_job.cleanup(ttl=dependent_job.ttl, pipeline=pipe)
+        await pipe.execute()
+
+    return job, dependent_job
@@ -1,6 +1,7 @@
 import sys
 import os
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 # Configuração do logger
 logging.basicConfig(level=logging.INFO)
@@ -10,15 +11,39 @@ logger = logging.getLogger(__name__)
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(project_root)
 
-import pandas as pd
-import pickle
 from rq import Queue, get_current_job
 from rq.registry import FinishedJobRegistry
 from scraping.get_user_ratings import get_user_data
-from model.build_model import build_model
+from model.artifacts import get_artifacts, on_load
+from model.build_model import build_model, fold_in_model
+from model.movie_metadata import MovieMetadataCache
 from model.run_model import run_model
+from db.db_connect import get_db
+from jobs.recs_cache import request_key, store_result, release_inflight, publish_model_version
+from jobs.progress import report_progress
+from scraping.user_ratings_cache import ratings_digest
 from worker import conn
 
+# "fold_in" scores users against the pretrained base model; "retrain" fits a new SVD per request
+MODEL_MODE = os.environ.get('MODEL_MODE', 'fold_in')
+# "split" runs scraping and the model as two dependent jobs; "single" runs both in one job
+RECS_PIPELINE = os.environ.get('RECS_PIPELINE', 'split')
+
+
+def publish_artifacts_version(artifacts):
+    """
+    Publish the version of newly loaded artifacts. The version is part of the results cache
+    key, so results cached with replaced artifacts stop being served.
+    """
+    publish_model_version(conn, artifacts.version)
+
+
+on_load(publish_artifacts_version)
+
+# Movie metadata cache, rebuilt whenever the worker loads a new set of artifacts
+_movie_cache = None
+_movie_cache_artifacts = None
+
 
 def get_previous_job_from_registry(index=-1):
     """
@@ -40,111 +65,227 @@ def get_previous_job_from_registry(index=-1):
         return None
 
 
-def filter_threshold_list(threshold_movie_list, review_count_threshold=2000):
+def get_movie_cache(artifacts):
     """
-    Filter movies that have review counts below a specified threshold.
+    Return the movie metadata cache seeded from the given artifacts' snapshot.
     
     Parameters:
-        threshold_movie_list (list): List of movie IDs that passed the initial threshold.
-        review_count_threshold (int): Maximum review count for filtering movies.
+        artifacts (Artifacts): The loaded artifacts.
     
     Returns:
-        list: Filtered list of movie IDs.
+        MovieMetadataCache: The metadata cache.
     """
-    try:
-        review_counts = pd.read_csv('data_processing/data/review_counts.csv')
-    except FileNotFoundError:
-        print("Review counts file not found.")
-        return threshold_movie_list
+    global _movie_cache, _movie_cache_artifacts
+    if _movie_cache is None or _movie_cache_artifacts is not artifacts:
+        _movie_cache = MovieMetadataCache(artifacts.movie_data, redis_conn=conn, db_factory=get_db)
+        _movie_cache_artifacts = artifacts
+    return _movie_cache
 
-    review_counts = review_counts.loc[review_counts['count'] < review_count_threshold]
-    included_movies = review_counts['movie_id'].to_list()
-    return [x for x in threshold_movie_list if x in included_movies]
 
-
-def get_client_user_data(username, data_opt_in):
+def get_client_user_data(username, data_opt_in, inflight_key=None):
     """
     Retrieve and save user data and status metadata for the current job.
     
     Parameters:
         username (str): Username of the client.
         data_opt_in (bool): Indicates if the client opted in to data sharing.
+        inflight_key (str): Request key to release if scraping fails, so identical
+            requests don't join a request that will never finish (optional).
     
     Returns:
         list: List of user's movie ratings.
     """
     logger.info(f"Iniciando get_client_user_data para {username}")
+    current_job = get_current_job(conn)
     try:
-        user_data = get_user_data(username, data_opt_in)
-        current_job = get_current_job(conn)
-        if current_job:
-            current_job.meta['user_status'] = user_data[1]
-            current_job.meta['num_user_ratings'] = len(user_data[0])
-            current_job.save()
+        user_data = get_user_data(username, data_opt_in, redis_conn=conn)
+        report_progress(current_job, status='finished', user_status=user_data[1], num_user_ratings=len(user_data[0]))
         return user_data[0]
     except Exception as e:
         logger.error(f"Erro em get_client_user_data para {username}: {str(e)}")
+        report_progress(current_job, status='failed')
+        if inflight_key:
+            release_inflight(conn, inflight_key)
         raise
 
 
-def build_client_model(username, training_data_rows=200000, popularity_threshold=None, num_items=30):
+def load_model_inputs(training_data_rows=200000, model_mode=None):
+    """
+    Load what a recommendation needs besides the user's ratings.
+    
+    Parameters:
+        training_data_rows (int): Number of rows for the training dataset sample (retrain mode only).
+        model_mode (str): "fold_in" or "retrain". Defaults to the MODEL_MODE environment variable.
+    
+    Returns:
+        tuple: The artifacts, the base model (None in retrain mode) and the training sample
+            (None in fold-in mode), or None if a required artifact is missing.
+    """
+    # Artifacts are loaded once per worker process and shared by every job
+    artifacts = get_artifacts()
+
+    model_mode = model_mode or MODEL_MODE
+    base_model = artifacts.base_model if model_mode == 'fold_in' else None
+    if model_mode == 'fold_in' and base_model is None:
+        print("Base model file not found, retraining model for the request.")
+
+    model_df = None
+    if base_model is None:
+        # Sample the training data
+        if artifacts.training_data is None:
+            print("Training data file not found.")
+            return None
+
+        model_df = artifacts.training_data.head(training_data_rows)
+
+    # Candidate movies, with the popularity filter applied as a precomputed mask
+    if artifacts.movie_index is None:
+        print("Threshold movie list file not found.")
+        return None
+
+    return artifacts, base_model, model_df
+
+
+def recommend(current_job, key, username, user_data, model_inputs, popularity_threshold=None, num_items=30):
+    """
+    Build the model for the user's ratings, generate recommendations and cache them.
+    
+    Parameters:
+        current_job (Job): The running job, used to report progress (optional).
+        key (str): The request key the result is cached under.
+        username (str): Username of the client.
+        user_data (list): List of user's movie ratings.
+        model_inputs (tuple): The tuple returned by `load_model_inputs`.
+        popularity_threshold (int): Threshold for filtering popular movies (optional).
+        num_items (int): Number of recommendations to generate.
+    
+    Returns:
+        list: List of movie recommendations.
+    """
+    artifacts, base_model, model_df = model_inputs
+
+    # Build and run the model
+    report_progress(current_job, stage='building_model')
+
+    if base_model is not None:
+        algo, user_watched_list = fold_in_model(base_model, username, user_data)
+    else:
+        algo, user_watched_list = build_model(model_df, user_data)
+
+    report_progress(current_job, stage='running_model')
+
+    recs = run_model(
+        username,
+        algo,
+        user_watched_list,
+        artifacts.movie_index,
+        num_items,
+        popularity_threshold,
+        movie_cache=get_movie_cache(artifacts),
+    )
+
+    # Cache the result for identical requests made with the same ratings snapshot and model
+    if user_data:
+        execution_data = {
+            "build_model_stage": 'running_model',
+            "num_user_ratings": len(user_data),
+            "user_status": 'success',
+        }
+        store_result(conn, key, ratings_digest(user_data), artifacts.version, recs, execution_data)
+
+    # Streams receive the result without waiting for the next /results poll
+    report_progress(current_job, status='finished', result=recs)
+    return recs
+
+
+def build_client_model(username, training_data_rows=200000, popularity_threshold=None, num_items=30, model_mode=None,
+                       data_opt_in=False):
     """
     Build a recommendation model for the client and generate movie recommendations.
     
     Parameters:
         username (str): Username for whom the model is being built.
-        training_data_rows (int): Number of rows for the training dataset sample.
+        training_data_rows (int): Number of rows for the training dataset sample (retrain mode only).
         popularity_threshold (int): Threshold for filtering popular movies (optional).
         num_items (int): Number of recommendations to generate.
+        model_mode (str): "fold_in" to use the pretrained base model or "retrain" to fit
+            a new SVD for the request. Defaults to the MODEL_MODE environment variable.
+        data_opt_in (bool): Whether the request opted in to data sharing; part of the request key.
     
     Returns:
         list: List of movie recommendations.
     """
     # Load user data from previous Redis job
     logger.info(f"Iniciando build_client_model para {username}")
+    key = request_key(username, training_data_rows, popularity_threshold, data_opt_in)
+    current_job = get_current_job(conn)
     try:
-        current_job = get_current_job(conn)
         user_data = current_job.dependency.result if current_job and current_job.dependency else []
 
-        if current_job:
-            current_job.meta['stage'] = 'creating_sample_data'
-            current_job.save()
+        report_progress(current_job, stage='creating_sample_data')
 
-        # Load training data and sample it
-        try:
-            df = pd.read_csv('data/ratings.csv')
-        except FileNotFoundError:
-            print("Training data file not found.")
-            return []
-        
-        model_df = df.head(training_data_rows)
-
-        # Load threshold movie list
-        try:
-            with open("model/threshold_movie_list.txt", "rb") as fp:
-                threshold_movie_list = pickle.load(fp)
-        except FileNotFoundError:
-            print("Threshold movie list file not found.")
+        model_inputs = load_model_inputs(training_data_rows, model_mode)
+        if model_inputs is None:
+            report_progress(current_job, status='finished', result=[])
             return []
 
-        # Apply popularity filter if specified
-        if popularity_threshold:
-            threshold_movie_list = filter_threshold_list(threshold_movie_list, popularity_threshold)
-        
-        # Build and run the model
-        if current_job:
-            current_job.meta['stage'] = 'building_model'
-            current_job.save()
-        
-        algo, user_watched_list = build_model(model_df, user_data)
-        
-        if current_job:
-            current_job.meta['stage'] = 'running_model'
-            current_job.save()
-        
-        recs = run_model(username, algo, user_watched_list, threshold_movie_list, num_items)
+        recs = recommend(current_job, key, username, user_data, model_inputs, popularity_threshold, num_items)
         logger.info(f"Finalizando build_client_model para {username}")
         return recs
     except Exception as e:
         logger.error(f"Erro em build_client_model para {username}: {str(e)}")
-        raise
\ No newline at end of file
+        report_progress(current_job, status='failed')
+        raise
+    finally:
+        release_inflight(conn, key)
+
+
+def build_client_recs(username, data_opt_in, training_data_rows=200000, popularity_threshold=None, num_items=30,
+                      model_mode=None):
+    """
+    Scrape the client's ratings and generate recommendations in a single job.
+    
+    The model and candidate set are loaded while the ratings are being scraped, and the
+    job stops early if the user doesn't exist. The job's meta holds both the stage and
+    the user status, so /results can be called with this job's ID for both jobs.
+    
+    Parameters:
+        username (str): Username of the client.
+        data_opt_in (bool): Indicates if the client opted in to data sharing.
+        training_data_rows (int): Number of rows for the training dataset sample (retrain mode only).
+        popularity_threshold (int): Threshold for filtering popular movies (optional).
+        num_items (int): Number of recommendations to generate.
+        model_mode (str): "fold_in" or "retrain". Defaults to the MODEL_MODE environment variable.
+    
+    Returns:
+        list: List of movie recommendations.
+    """
+    logger.info(f"Iniciando build_client_recs para {username}")
+    key = request_key(username, training_data_rows, popularity_threshold, data_opt_in)
+    current_job = get_current_job(conn)
+    try:
+        report_progress(current_job, stage='creating_sample_data')
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            scrape = executor.submit(get_user_data, username, data_opt_in, redis_conn=conn)
+            model_inputs = load_model_inputs(training_data_rows, model_mode)
+            if model_inputs is not None:
+                # Warm the metadata cache for the artifacts in use
+                get_movie_cache(model_inputs[0])
+            user_data, user_status = scrape.result()
+
+        report_progress(current_job, user_status=user_status, num_user_ratings=len(user_data))
+
+        if user_status == 'user_not_found' or model_inputs is None:
+            report_progress(current_job, status='finished', result=[])
+            return []
+
+        recs = recommend(current_job, key, username, user_data, model_inputs, popularity_threshold, num_items)
+        logger.info(f"Finalizando build_client_recs para {username}")
+        return recs
+    except Exception as e:
+        logger.error(f"Erro em build_client_recs para {username}: {str(e)}")
+        report_progress(current_job, status='failed')
+        raise
+    finally:
+        release_inflight(conn, key)
@@ -0,0 +1,136 @@
+import sys
+import os
+import json
+import asyncio
+import logging
+
+# Adiciona o diretório raiz do projeto ao Python Path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "job_progress:{}"
+# Intervalo entre comentários keep-alive e duração máxima de um stream
+HEARTBEAT_SECONDS = 15
+STREAM_TIMEOUT = int(os.environ.get('PROGRESS_STREAM_TIMEOUT', 300))
+
+
+def report_progress(job, status=None, result=None, **meta):
+    """
+    Save progress metadata on the job and publish it to the job's progress channel.
+
+    Parameters:
+        job (Job): The current job, or None when running outside of a worker.
+        status (str): Job status to announce, e.g. "finished" or "failed" (optional).
+        result: The job's return value, published once with the "finished" status (optional).
+        **meta: Metadata saved in job.meta, e.g. stage or user_status.
+    """
+    if job is None:
+        return
+
+    if meta:
+        job.meta.update(meta)
+        job.save_meta()
+
+    message = dict(meta)
+    if status:
+        message["status"] = status
+    if result is not None:
+        message["result"] = result
+
+    try:
+        job.connection.publish(CHANNEL.format(job.id), json.dumps(message, default=str))
+    except Exception as e:
+        # Polling /results still works without the published message
+        logger.error(f"Erro ao publicar progresso do trabalho {job.id}: {str(e)}")
+
+
+def format_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def apply_progress(content, job_key, message):
+    """
+    Apply a published progress message to a /results response body.
+
+    Parameters:
+        content (dict): The response body, updated in place.
+        job_key (str): "redis_build_model_job" or "redis_get_user_data_job".
+        message (dict): The published message.
+    """
+    statuses = content.setdefault("statuses", {})
+    execution_data = content.setdefault("execution_data", {})
+
+    if "stage" in message:
+        execution_data["build_model_stage"] = message["stage"]
+        statuses[f"{job_key}_status"] = "started"
+    for field in ("user_status", "num_user_ratings"):
+        if field in message:
+            execution_data[field] = message[field]
+    if "status" in message:
+        statuses[f"{job_key}_status"] = message["status"]
+    if "result" in message:
+        content["result"] = message["result"]
+
+
+async def stream_progress(async_conn, redis_build_model_job_id, redis_get_user_data_job_id, read_snapshot):
+    """
+    Server-Sent Events stream of a recommendation request's progress.
+
+    Sends the current state as a "progress" event, then one "progress" event per published
+    transition, and finally a "result" event with the same body as a finished /results call.
+
+    Parameters:
+        async_conn (redis.asyncio.Redis): Async Redis connection used for pub/sub.
+        redis_build_model_job_id (str): ID of the build model job.
+        redis_get_user_data_job_id (str): ID of the user data job.
+        read_snapshot (callable): Coroutine function returning (status_code, content) as /results does.
+
+    Yields:
+        str: Encoded SSE events.
+    """
+    # In single-job mode both IDs are the same job, so one channel updates both statuses
+    channels = {}
+    for job_id, job_key in ((redis_build_model_job_id, "redis_build_model_job"),
+                            (redis_get_user_data_job_id, "redis_get_user_data_job")):
+        channels.setdefault(CHANNEL.format(job_id), []).append(job_key)
+
+    pubsub = async_conn.pubsub()
+    # Subscribe before reading the snapshot so no transition is missed in between
+    await pubsub.subscribe(*channels)
+    try:
+        status_code, content = await read_snapshot()
+        if status_code != 202:
+            yield format_event("result", content)
+            return
+        yield format_event("progress", content)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + STREAM_TIMEOUT
+        while loop.time() < deadline:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=HEARTBEAT_SECONDS)
+            if message is None:
+                yield ": keep-alive\n\n"
+                continue
+
+            channel = message["channel"]
+            channel = channel.decode() if isinstance(channel, bytes) else channel
+            progress = json.loads(message["data"])
+            for job_key in channels[channel]:
+                apply_progress(content, job_key, progress)
+
+            if "result" in content:
+                yield format_event("result", content)
+                return
+            yield format_event("progress", content)
+
+            if "failed" in content["statuses"].values():
+                return
+
+        # Timed out: send whatever state the jobs are in now
+        status_code, content = await read_snapshot()
+        yield format_event("result" if status_code != 202 else "progress", content)
+    finally:
+        await pubsub.unsubscribe()
+        await pubsub.aclose()
@@ -0,0 +1,119 @@
+import sys
+import os
+import math
+import time
+import logging
+import threading
+
+# Adiciona o diretório raiz do projeto ao Python Path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from rq.registry import StartedJobRegistry, DeferredJobRegistry
+
+logger = logging.getLogger(__name__)
+
+# Seconds a load snapshot is reused before Redis is read again
+LOAD_SNAPSHOT_TTL = float(os.environ.get('QUEUE_LOAD_SNAPSHOT_TTL', 1))
+# Requests are rejected once even the least loaded queue holds this many jobs (0 disables)
+MAX_QUEUE_BACKLOG = int(os.environ.get('MAX_QUEUE_BACKLOG', 0))
+# Rough time a worker spends on one job, used to estimate the Retry-After hint
+SECONDS_PER_JOB = float(os.environ.get('QUEUE_SECONDS_PER_JOB', 2))
+
+# Queued + started + deferred jobs of every queue, read atomically.
+# KEYS holds (queue list, started registry, deferred registry) triples.
+QUEUE_LOAD_SCRIPT = """
+local loads = {}
+for i = 1, #KEYS, 3 do
+    loads[#loads + 1] = redis.call('LLEN', KEYS[i]) + redis.call('ZCARD', KEYS[i + 1]) + redis.call('ZCARD', KEYS[i + 2])
+end
+return loads
+"""
+
+
+class QueueOverloaded(Exception):
+    """Raised when every queue's backlog is over the admission limit."""
+
+    def __init__(self, backlog, retry_after):
+        super().__init__(f"Fila com {backlog} trabalhos pendentes")
+        self.backlog = backlog
+        self.retry_after = retry_after
+
+
+class QueueSelector:
+    """
+    Picks the least loaded RQ queue from a load snapshot shared by all requests.
+
+    The snapshot is computed by a Lua script in one round trip and reused for
+    `snapshot_ttl` seconds. Jobs enqueued by this process since the snapshot are added
+    to it, so a burst of requests is spread over the queues instead of piling on one.
+    """
+
+    def __init__(self, redis_conn, queues, snapshot_ttl=LOAD_SNAPSHOT_TTL, max_backlog=MAX_QUEUE_BACKLOG,
+                 seconds_per_job=SECONDS_PER_JOB, async_conn=None):
+        self.queues = queues
+        self.snapshot_ttl = snapshot_ttl
+        self.max_backlog = max_backlog
+        self.seconds_per_job = seconds_per_job
+        self._script = redis_conn.register_script(QUEUE_LOAD_SCRIPT)
+        # Optional asyncio connection used by loads_async and select_async
+        self._async_script = async_conn.register_script(QUEUE_LOAD_SCRIPT) if async_conn is not None else None
+        self._keys = []
+        for queue in queues:
+            self._keys += [queue.key, StartedJobRegistry(queue=queue).key, DeferredJobRegistry(queue=queue).key]
+        self._loads = None
+        self._read_at = 0
+        self._lock = threading.Lock()
+
+    def _is_stale(self):
+        return self._loads is None or time.monotonic() - self._read_at >= self.snapshot_ttl
+
+    def _store_loads(self, loads):
+        """Replace the snapshot with the script's reply, if one was read, and return a copy of it."""
+        with self._lock:
+            if loads is not None:
+                self._loads = [int(load) for load in loads]
+                self._read_at = time.monotonic()
+            return list(self._loads)
+
+    def loads(self):
+        """Return the number of queued, started and deferred jobs of each queue."""
+        return self._store_loads(self._script(keys=self._keys) if self._is_stale() else None)
+
+    async def loads_async(self):
+        """Same as `loads`, reading the snapshot on the asyncio connection."""
+        return self._store_loads(await self._async_script(keys=self._keys) if self._is_stale() else None)
+
+    def _pick(self, loads, num_jobs):
+        index = min(range(len(self.queues)), key=lambda i: loads[i])
+        backlog = loads[index]
+
+        if self.max_backlog and backlog >= self.max_backlog:
+            # Time for the workers to drain the excess, shared across the queues
+            excess = backlog - self.max_backlog + num_jobs
+            retry_after = max(1, math.ceil(excess * self.seconds_per_job / len(self.queues)))
+            raise QueueOverloaded(backlog, retry_after)
+
+        with self._lock:
+            if self._loads is not None:
+                self._loads[index] += num_jobs
+        return self.queues[index]
+
+    def select(self, num_jobs=1):
+        """
+        Return the least loaded queue and count the jobs about to be enqueued on it.
+
+        Parameters:
+            num_jobs (int): Number of jobs the caller will enqueue.
+
+        Returns:
+            Queue: The selected queue.
+
+        Raises:
+            QueueOverloaded: If the least loaded queue is over the backlog limit.
+        """
+        return self._pick(self.loads(), num_jobs)
+
+    async def select_async(self, num_jobs=1):
+        """Same as `select`, reading the snapshot on the asyncio connection."""
+        return self._pick(await self.loads_async(), num_jobs)
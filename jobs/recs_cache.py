@@ -0,0 +1,192 @@
+import sys
+import os
+import json
+import logging
+
+# Adiciona o diretório raiz do projeto ao Python Path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+logger = logging.getLogger(__name__)
+
+RESULT_KEY = "recs_result:{}:{}"
+INFLIGHT_KEY = "recs_inflight:{}"
+# Version of the artifacts the workers are currently scoring with
+MODEL_VERSION_KEY = "recs_model_version"
+# Prefix of the job IDs handed out for results served from the cache
+CACHED_JOB_PREFIX = "cached:"
+RESULT_TTL = int(os.environ.get('RECS_RESULT_CACHE_TTL', 900))
+
+
+def request_key(username, training_data_size, popularity_threshold, data_opt_in=False):
+    """
+    Key identifying a recommendation request by the parameters that affect its result or its
+    side effects. `data_opt_in` is part of it so an opted-in request is never answered by a
+    cached or running opted-out one, which would skip saving the user's ratings.
+
+    Parameters:
+        username (str): Username of the client.
+        training_data_size (int): Number of rows for the training dataset sample.
+        popularity_threshold (int): Threshold for filtering popular movies (optional).
+        data_opt_in (bool): Indicates if the client opted in to data sharing.
+
+    Returns:
+        str: The request key.
+    """
+    return f"{username}:{training_data_size}:{popularity_threshold}:{int(bool(data_opt_in))}"
+
+
+def _result_key(key, digest):
+    return RESULT_KEY.format(key, digest)
+
+
+def _inflight_key(key):
+    return INFLIGHT_KEY.format(key)
+
+
+def _claim_args(key, job_ids, ttl):
+    """Arguments of the SET that claims a request, shared by `claim_inflight` and `claim_inflight_async`."""
+    return (_inflight_key(key), json.dumps(job_ids)), {"nx": True, "ex": ttl}
+
+
+def _decode_result(value):
+    return json.loads(value) if value else None
+
+
+def result_digest(ratings_digest, model_version):
+    """
+    Digest a result is cached under: the user's ratings snapshot and the artifacts that scored
+    it, so results from a model the workers have since replaced are never served.
+    """
+    return f"{model_version}-{ratings_digest}"
+
+
+def publish_model_version(redis_conn, model_version):
+    """Record the version of the artifacts the workers are scoring with. Called when artifacts are loaded."""
+    try:
+        redis_conn.set(MODEL_VERSION_KEY, model_version)
+    except Exception as e:
+        logger.error(f"Erro ao publicar versão do modelo {model_version}: {str(e)}")
+
+
+async def get_model_version_async(async_conn):
+    """Version published by `publish_model_version`, or None if no worker has published one."""
+    value = await async_conn.get(MODEL_VERSION_KEY)
+    return value.decode() if value else None
+
+
+def cached_job_id(key, digest):
+    """Job ID returned to clients for a result served from the cache."""
+    return f"{CACHED_JOB_PREFIX}{key}:{digest}"
+
+
+def is_cached_job_id(job_id):
+    return job_id.startswith(CACHED_JOB_PREFIX)
+
+
+def get_cached_result(redis_conn, key, digest):
+    """
+    Look up a finished recommendation for the request and ratings snapshot.
+
+    Parameters:
+        redis_conn (Redis): Redis connection.
+        key (str): The request key.
+        digest (str): Digest from `result_digest`.
+
+    Returns:
+        dict: The cached "result" and "execution_data", or None.
+    """
+    return _decode_result(redis_conn.get(_result_key(key, digest)))
+
+
+def result_key_for_job_id(job_id):
+    """Redis key of the cached result behind a job ID handed out by `cached_job_id`."""
+    return _result_key(*job_id[len(CACHED_JOB_PREFIX):].rsplit(":", 1))
+
+
+async def get_cached_result_async(async_conn, key, digest):
+    """Same as `get_cached_result`, on an asyncio Redis connection."""
+    return _decode_result(await async_conn.get(_result_key(key, digest)))
+
+
+def get_result_by_job_id(redis_conn, job_id):
+    """
+    Look up a cached result from the job ID handed out by `cached_job_id`.
+
+    Returns:
+        dict: The cached "result" and "execution_data", or None if it expired.
+    """
+    return _decode_result(redis_conn.get(result_key_for_job_id(job_id)))
+
+
+def store_result(redis_conn, key, digest, model_version, result, execution_data):
+    """
+    Cache a finished recommendation for the request, ratings snapshot and model version.
+
+    Parameters:
+        redis_conn (Redis): Redis connection.
+        key (str): The request key.
+        digest (str): Digest of the user's ratings snapshot.
+        model_version (str): Version of the artifacts that produced the result.
+        result (list): The recommendations.
+        execution_data (dict): User metadata reported by /results.
+    """
+    try:
+        value = json.dumps({"result": result, "execution_data": execution_data}, default=str)
+        redis_conn.set(_result_key(key, result_digest(digest, model_version)), value, ex=RESULT_TTL)
+    except Exception as e:
+        logger.error(f"Erro ao gravar resultado em cache para {key}: {str(e)}")
+
+
+def claim_inflight(redis_conn, key, job_ids, ttl):
+    """
+    Register the jobs about to be enqueued for a request, unless an identical request is
+    already running.
+
+    Parameters:
+        redis_conn (Redis): Redis connection.
+        key (str): The request key.
+        job_ids (dict): The job IDs that will be returned to the client.
+        ttl (int): Seconds after which the claim expires if it is never released.
+
+    Returns:
+        dict: None if the claim succeeded, otherwise the job IDs of the running request.
+    """
+    args, options = _claim_args(key, job_ids, ttl)
+    if redis_conn.set(*args, **options):
+        return None
+
+    value = redis_conn.get(_inflight_key(key))
+    if value is None:
+        # The running request finished between the two calls, so try again
+        return claim_inflight(redis_conn, key, job_ids, ttl)
+    return _decode_result(value)
+
+
+async def claim_inflight_async(async_conn, key, job_ids, ttl):
+    """Same as `claim_inflight`, on an asyncio Redis connection."""
+    args, options = _claim_args(key, job_ids, ttl)
+    if await async_conn.set(*args, **options):
+        return None
+
+    value = await async_conn.get(_inflight_key(key))
+    if value is None:
+        # The running request finished between the two calls, so try again
+        return await claim_inflight_async(async_conn, key, job_ids, ttl)
+    return _decode_result(value)
+
+
+def release_inflight(redis_conn, key):
+    """Forget the running request so later identical requests enqueue new jobs."""
+    try:
+        redis_conn.delete(_inflight_key(key))
+    except Exception as e:
+        logger.error(f"Erro ao liberar requisição em andamento {key}: {str(e)}")
+
+
+async def release_inflight_async(async_conn, key):
+    """Same as `release_inflight`, on an asyncio Redis connection."""
+    try:
+        await async_conn.delete(_inflight_key(key))
+    except Exception as e:
+        logger.error(f"Erro ao liberar requisição em andamento {key}: {str(e)}")
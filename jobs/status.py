@@ -0,0 +1,195 @@
+import sys
+import os
+import json
+
+# Adiciona o diretório raiz do projeto ao Python Path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from rq.job import Job, JobStatus
+from rq.results import Result
+
+from jobs.recs_cache import is_cached_job_id, result_key_for_job_id
+
+# Maximum number of job pairs accepted by a single batch status request
+MAX_BATCH_SIZE = int(os.environ.get('RESULTS_MAX_BATCH_SIZE', 100))
+
+
+def queue_status_reads(pipe, redis_build_model_job_id, redis_get_user_data_job_id):
+    """
+    Queue on a pipeline every read needed to report a recommendation request.
+
+    Results served from the cache need a single GET. Otherwise both job hashes (status and
+    meta) and the latest entry of the build job's result stream are read.
+
+    Parameters:
+        pipe (Pipeline): Redis pipeline, sync or async.
+        redis_build_model_job_id (str): ID of the build model job.
+        redis_get_user_data_job_id (str): ID of the user data job.
+
+    Returns:
+        int: Number of commands queued, to slice the pipeline's replies.
+    """
+    if is_cached_job_id(redis_build_model_job_id):
+        pipe.get(result_key_for_job_id(redis_build_model_job_id))
+        return 1
+
+    pipe.hgetall(Job.key_for(redis_build_model_job_id))
+    pipe.hgetall(Job.key_for(redis_get_user_data_job_id))
+    pipe.xrevrange(Result.get_key(redis_build_model_job_id), '+', '-', count=1)
+    return 3
+
+
+def parse_status_reads(redis_conn, redis_build_model_job_id, redis_get_user_data_job_id, replies):
+    """
+    Build the /results response from the replies of the reads queued by `queue_status_reads`.
+
+    Parameters:
+        redis_conn (Redis): Redis connection the jobs are bound to.
+        redis_build_model_job_id (str): ID of the build model job.
+        redis_get_user_data_job_id (str): ID of the user data job.
+        replies (list): The pipeline replies for this request.
+
+    Returns:
+        status_code (int): 200 when the result is ready, 202 while the jobs are running,
+            404 when the result has expired.
+        content (dict): The response body.
+    """
+    # Resultados servidos do cache não têm trabalhos no RQ
+    if is_cached_job_id(redis_build_model_job_id):
+        if not replies[0]:
+            return 404, {"error": "result_expired"}
+        cached = json.loads(replies[0])
+        return 200, {
+            "statuses": {
+                "redis_build_model_job_status": "finished",
+                "redis_get_user_data_job_status": "finished",
+            },
+            "execution_data": cached["execution_data"],
+            "result": cached["result"],
+        }
+
+    build_raw, user_raw, latest_result = replies
+    if not build_raw:
+        # The build job's result_ttl ran out
+        return 404, {"error": "result_expired"}
+
+    end_job = Job(redis_build_model_job_id, connection=redis_conn)
+    end_job.restore(build_raw)
+    user_job = None
+    if user_raw:
+        user_job = Job(redis_get_user_data_job_id, connection=redis_conn)
+        user_job.restore(user_raw)
+
+    # Trabalhos que já expiraram do Redis são considerados finalizados
+    job_statuses = {
+        "redis_build_model_job_status": end_job.get_status(refresh=False),
+        "redis_get_user_data_job_status": user_job.get_status(refresh=False) if user_job else "finished",
+    }
+
+    # Obter dados de execução do modelo
+    execution_data = {"build_model_stage": end_job.meta.get("stage")}
+    if user_job:
+        execution_data.update({
+            "num_user_ratings": user_job.meta.get("num_user_ratings"),
+            "user_status": user_job.meta.get("user_status"),
+        })
+
+    if end_job.get_status(refresh=False) != JobStatus.FINISHED:
+        return 202, {"statuses": job_statuses, "execution_data": execution_data}
+
+    # Same lookup as Job.return_value() with Result.fetch_latest, from the reply already read:
+    # the return value of the latest entry of the result stream, if it was successful
+    result = None
+    if latest_result:
+        result_id, payload = latest_result[0]
+        result_id = result_id.decode() if isinstance(result_id, bytes) else result_id
+        latest = Result.restore(end_job.id, result_id, payload, connection=redis_conn, serializer=end_job.serializer)
+        if latest.type == Result.Type.SUCCESSFUL:
+            result = latest.return_value
+
+    return 200, {
+        "statuses": job_statuses,
+        "execution_data": execution_data,
+        "result": result,
+    }
+
+
+def parse_many_status_reads(redis_conn, job_pairs, counts, replies):
+    """
+    Split the pipeline replies of many requests and build each response with `parse_status_reads`.
+
+    Parameters:
+        redis_conn (Redis): Redis connection the jobs are bound to, sync or async. The jobs are
+            only restored from the replies, no command is sent on it.
+        job_pairs (list): (redis_build_model_job_id, redis_get_user_data_job_id) tuples.
+        counts (list): Number of commands `queue_status_reads` queued for each pair.
+        replies (list): The pipeline replies.
+
+    Returns:
+        list: (status_code, content) tuples, in the order of job_pairs.
+    """
+    responses = []
+    offset = 0
+    for pair, count in zip(job_pairs, counts):
+        responses.append(parse_status_reads(redis_conn, *pair, replies[offset:offset + count]))
+        offset += count
+    return responses
+
+
+def read_many_results(redis_conn, job_pairs):
+    """
+    Report many recommendation requests with a single Redis round trip.
+
+    Parameters:
+        redis_conn (Redis): Redis connection.
+        job_pairs (list): (redis_build_model_job_id, redis_get_user_data_job_id) tuples.
+
+    Returns:
+        list: (status_code, content) tuples, in the order of job_pairs.
+    """
+    with redis_conn.pipeline(transaction=False) as pipe:
+        counts = [queue_status_reads(pipe, *pair) for pair in job_pairs]
+        replies = pipe.execute()
+
+    return parse_many_status_reads(redis_conn, job_pairs, counts, replies)
+
+
+async def read_many_results_async(async_conn, job_pairs):
+    """
+    Same as `read_many_results`, on an asyncio Redis connection.
+
+    Parameters:
+        async_conn (redis.asyncio.Redis): Async Redis connection.
+        job_pairs (list): (redis_build_model_job_id, redis_get_user_data_job_id) tuples.
+
+    Returns:
+        list: (status_code, content) tuples, in the order of job_pairs.
+    """
+    async with async_conn.pipeline(transaction=False) as pipe:
+        counts = [queue_status_reads(pipe, *pair) for pair in job_pairs]
+        replies = await pipe.execute()
+
+    return parse_many_status_reads(async_conn, job_pairs, counts, replies)
+
+
+def read_results(redis_conn, redis_build_model_job_id, redis_get_user_data_job_id):
+    """
+    Read the statuses, execution data and (when finished) result of a recommendation request.
+
+    Parameters:
+        redis_conn (Redis): Redis connection.
+        redis_build_model_job_id (str): ID of the build model job.
+        redis_get_user_data_job_id (str): ID of the user data job.
+
+    Returns:
+        status_code (int): 200 when the result is ready, 202 while the jobs are running,
+            404 when the result has expired.
+        content (dict): The response body.
+    """
+    return read_many_results(redis_conn, [(redis_build_model_job_id, redis_get_user_data_job_id)])[0]
+
+
+async def read_results_async(async_conn, redis_build_model_job_id, redis_get_user_data_job_id):
+    """Same as `read_results`, on an asyncio Redis connection."""
+    return (await read_many_results_async(async_conn, [(redis_build_model_job_id, redis_get_user_data_job_id)]))[0]
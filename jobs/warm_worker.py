@@ -0,0 +1,61 @@
+import sys
+import os
+import signal
+import logging
+
+# Adiciona o diretório raiz do projeto ao Python Path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from rq import Worker, SimpleWorker
+
+from model import artifacts
+from db.db_connect import get_pool_stats
+
+logger = logging.getLogger(__name__)
+
+
+class WarmWorkerMixin:
+    """
+    Keeps the recommendation artifacts loaded in the worker process and checks for new
+    ones published by the refresh pipeline before each job. Sending SIGHUP to the worker
+    forces a reload before the next job.
+    """
+
+    def preload(self):
+        # Registered before the first load so its version is published too
+        from jobs.handle_recs import publish_artifacts_version
+        artifacts.on_load(publish_artifacts_version)
+        artifacts.reload_artifacts()
+        signal.signal(signal.SIGHUP, lambda signum, frame: artifacts.request_reload())
+
+    def execute_job(self, job, queue):
+        try:
+            artifacts.refresh_if_stale()
+        except Exception as e:
+            # Keep serving with the artifacts already in memory
+            logger.error(f"Erro ao recarregar artefatos: {str(e)}")
+        try:
+            return super().execute_job(job, queue)
+        finally:
+            logger.info(f"Pool MongoDB: {get_pool_stats()}")
+
+
+class WarmWorker(WarmWorkerMixin, Worker):
+    """
+    Forking worker whose parent holds the artifacts, so every work horse inherits them
+    copy-on-write instead of loading them again.
+    """
+
+
+class WarmSimpleWorker(WarmWorkerMixin, SimpleWorker):
+    """
+    Non-forking worker that runs every job in the process holding the artifacts.
+    """
+
+
+WORKER_CLASSES = {
+    "cold": Worker,
+    "warm": WarmSimpleWorker,
+    "warm_fork": WarmWorker,
+}
@@ -1,14 +1,28 @@
 from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from rq import Queue
-from rq.exceptions import NoSuchJobError
-from rq.job import Job
-from rq.registry import DeferredJobRegistry
 
-from worker import conn
-from jobs.handle_recs import get_client_user_data, build_client_model
+from uuid import uuid4
+
+from worker import conn, async_conn
+from jobs.handle_recs import get_client_user_data, build_client_model, build_client_recs, RECS_PIPELINE
+from jobs.recs_cache import (
+    request_key,
+    cached_job_id,
+    get_cached_result_async,
+    get_model_version_async,
+    result_digest,
+    claim_inflight_async,
+    release_inflight_async,
+)
+from jobs.queue_select import QueueSelector, QueueOverloaded
+from jobs.async_enqueue import enqueue_async, enqueue_with_dependent_async
+from jobs.status import read_results_async, read_many_results_async, MAX_BATCH_SIZE
+from jobs.progress import stream_progress
+from model.movie_index import popularity_thresholds_500k_samples
+from scraping.user_ratings_cache import get_digest_async
 
 ORIGINS = [
     "http://localhost",
@@ -30,9 +44,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Filas Redis e thresholds
+# Filas Redis
 queue_pool = [Queue(channel, connection=conn) for channel in ["high", "default", "low"]]
-popularity_thresholds_500k_samples = [2500, 2000, 1500, 1000, 700, 400, 250, 150]
+queue_selector = QueueSelector(conn, queue_pool, async_conn=async_conn)
 
 
 class RecommendationRequest(BaseModel):
@@ -41,12 +55,21 @@ class RecommendationRequest(BaseModel):
     popularity_filter: int
     data_opt_in: bool
 
+
+class ResultsJobs(BaseModel):
+    redis_build_model_job_id: str
+    redis_get_user_data_job_id: str
+
+
+class BatchResultsRequest(BaseModel):
+    jobs: list[ResultsJobs]
+
 @app.get("/")
 async def root():
     return {"message": "Hello from FastAPI!"}
 
 @app.get("/get_recs")
-def get_recs(username: str, training_data_size: int, popularity_filter: int, data_opt_in: bool):
+async def get_recs(username: str, training_data_size: int, popularity_filter: int, data_opt_in: bool):
     # Validar filtro de popularidade
     popularity_threshold = (
         popularity_thresholds_500k_samples[popularity_filter]
@@ -55,28 +78,81 @@ def get_recs(username: str, training_data_size: int, popularity_filter: int, dat
     )
     
     num_items = 1400
+    key = request_key(username, training_data_size, popularity_threshold, data_opt_in)
+
+    # Retornar resultado em cache se as avaliações do usuário e o modelo não mudaram
+    digest = await get_digest_async(async_conn, username)
+    model_version = await get_model_version_async(async_conn) if digest else None
+    if model_version:
+        digest = result_digest(digest, model_version)
+    if model_version and await get_cached_result_async(async_conn, key, digest) is not None:
+        job_id = cached_job_id(key, digest)
+        return JSONResponse(
+            {
+                "redis_get_user_data_job_id": job_id,
+                "redis_build_model_job_id": job_id,
+            }
+        )
 
-    # Obter fila com menor carga de trabalho
-    ordered_queues = sorted(queue_pool, key=lambda queue: DeferredJobRegistry(queue=queue).count)
-    q = ordered_queues[0]
+    # Reaproveitar os trabalhos de uma requisição idêntica em andamento
+    single_job = RECS_PIPELINE == "single"
+    job_ids = {
+        "redis_get_user_data_job_id": str(uuid4()),
+        "redis_build_model_job_id": str(uuid4()),
+    }
+    if single_job:
+        # O mesmo trabalho responde pelos dois IDs em /results
+        job_ids["redis_build_model_job_id"] = job_ids["redis_get_user_data_job_id"]
+    running_job_ids = await claim_inflight_async(async_conn, key, job_ids, ttl=400)
+    if running_job_ids is not None:
+        return JSONResponse(running_job_ids)
+
+    # Obter fila com menor carga de trabalho, recusando a requisição se todas estiverem cheias
+    try:
+        q = await queue_selector.select_async(num_jobs=1 if single_job else 2)
+    except QueueOverloaded as e:
+        await release_inflight_async(async_conn, key)
+        return JSONResponse(
+            status_code=503,
+            content={"error": "queue_overloaded", "retry_after": e.retry_after},
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+    # Modo de trabalho único: scraping e modelo no mesmo trabalho
+    if single_job:
+        job = q.create_job(
+            build_client_recs,
+            args=(username, data_opt_in, training_data_size, popularity_threshold, num_items),
+            job_id=job_ids["redis_build_model_job_id"],
+            description=f"Scraping user data and building model for {username} (sample: {training_data_size}, popularity_filter: {popularity_threshold}, data_opt_in: {data_opt_in})",
+            result_ttl=30,
+            ttl=200,
+        )
+        await enqueue_async(async_conn, q, job)
+        return JSONResponse(job_ids)
 
-    # Adicionar trabalhos na fila
-    job_get_user_data = q.enqueue(
+    # Adicionar trabalhos na fila (os dois em uma única transação)
+    job_get_user_data = q.create_job(
         get_client_user_data,
         args=(username, data_opt_in),
+        kwargs={"inflight_key": key},
+        job_id=job_ids["redis_get_user_data_job_id"],
         description=f"Scraping user data for {username} (sample: {training_data_size}, popularity_filter: {popularity_threshold}, data_opt_in: {data_opt_in})",
         result_ttl=45,
         ttl=200,
     )
     
-    job_build_model = q.enqueue(
+    job_build_model = q.create_job(
         build_client_model,
         args=(username, training_data_size, popularity_threshold, num_items),
+        kwargs={"data_opt_in": data_opt_in},
         depends_on=job_get_user_data,
+        job_id=job_ids["redis_build_model_job_id"],
         description=f"Building model for {username} (sample: {training_data_size}, popularity_filter: {popularity_threshold})",
         result_ttl=30,
         ttl=200,
     )
+    await enqueue_with_dependent_async(async_conn, q, job_get_user_data, job_build_model)
 
     # Retornar IDs dos trabalhos
     return JSONResponse(
@@ -88,46 +164,42 @@ def get_recs(username: str, training_data_size: int, popularity_filter: int, dat
 
 
 @app.get("/results")
-def get_results(redis_build_model_job_id: str, redis_get_user_data_job_id: str):
-    # Preparar dicionário com IDs dos trabalhos
-    job_ids = {
-        "redis_build_model_job_id": redis_build_model_job_id,
-        "redis_get_user_data_job_id": redis_get_user_data_job_id,
-    }
+async def get_results(redis_build_model_job_id: str, redis_get_user_data_job_id: str):
+    status_code, content = await read_results_async(async_conn, redis_build_model_job_id, redis_get_user_data_job_id)
+    return JSONResponse(status_code=status_code, content=content)
 
-    # Consultar status dos trabalhos
-    job_statuses = {}
-    for key, job_id in job_ids.items():
-        try:
-            job_statuses[key.replace("_id", "_status")] = Job.fetch(job_id, connection=conn).get_status()
-        except NoSuchJobError:
-            job_statuses[key.replace("_id", "_status")] = "finished"
 
-    # Obter dados de execução do modelo
-    end_job = Job.fetch(job_ids["redis_build_model_job_id"], connection=conn)
-    execution_data = {"build_model_stage": end_job.meta.get("stage")}
+@app.post("/results/batch")
+async def get_results_batch(request: BatchResultsRequest):
+    # Consultar vários pares de trabalhos com uma única ida ao Redis
+    if len(request.jobs) > MAX_BATCH_SIZE:
+        return JSONResponse(status_code=400, content={"error": "too_many_jobs", "max_batch_size": MAX_BATCH_SIZE})
 
-    try:
-        user_job = Job.fetch(job_ids["redis_get_user_data_job_id"], connection=conn)
-        execution_data.update({
-            "num_user_ratings": user_job.meta.get("num_user_ratings"),
-            "user_status": user_job.meta.get("user_status"),
-        })
-    except NoSuchJobError:
-        pass
-
-    # Retornar resultado ou status parcial
-    if end_job.is_finished:
-        return JSONResponse(
-            status_code=200,
-            content={
-                "statuses": job_statuses,
-                "execution_data": execution_data,
-                "result": end_job.result,
-            },
-        )
-    else:
-        return JSONResponse(
-            status_code=202,
-            content={"statuses": job_statuses, "execution_data": execution_data},
-        )
\ No newline at end of file
+    job_pairs = [(jobs.redis_build_model_job_id, jobs.redis_get_user_data_job_id) for jobs in request.jobs]
+    responses = await read_many_results_async(async_conn, job_pairs)
+    return JSONResponse(
+        content={
+            "results": [
+                {
+                    "redis_build_model_job_id": build_id,
+                    "redis_get_user_data_job_id": user_id,
+                    "status_code": status_code,
+                    **content,
+                }
+                for (build_id, user_id), (status_code, content) in zip(job_pairs, responses)
+            ]
+        }
+    )
+
+
+@app.get("/results/stream")
+async def stream_results(redis_build_model_job_id: str, redis_get_user_data_job_id: str):
+    # Envia o progresso dos trabalhos via Server-Sent Events, sem polling do cliente
+    async def read_snapshot():
+        return await read_results_async(async_conn, redis_build_model_job_id, redis_get_user_data_job_id)
+
+    return StreamingResponse(
+        stream_progress(async_conn, redis_build_model_job_id, redis_get_user_data_job_id, read_snapshot),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
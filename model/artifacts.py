@@ -0,0 +1,170 @@
+import sys
+import os
+import json
+import hashlib
+import logging
+import threading
+
+# Adiciona o diretório raiz do projeto ao Python Path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+import pandas as pd
+import pickle
+
+from model.base_model import BaseModel, BASE_MODEL_PATH
+from model.movie_index import MovieIndex
+from model.movie_metadata import MOVIE_DATA_PATH, load_movie_snapshot
+from model.ratings_store import RATINGS_STORE_PATH, load_training_data
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_PATHS = {
+    "training_data": RATINGS_STORE_PATH,
+    "threshold_movie_list": "model/threshold_movie_list.txt",
+    "review_counts": "data/review_counts.csv",
+    "movie_data": MOVIE_DATA_PATH,
+    "base_model": BASE_MODEL_PATH,
+}
+
+
+class Artifacts:
+    """
+    Data and model files needed by recommendation jobs, loaded once per process.
+
+    Any artifact whose file is missing is left as None, so callers can keep their
+    existing "file not found" fallbacks.
+    """
+
+    def __init__(self, training_data=None, threshold_movie_list=None, review_counts=None, movie_data=None, base_model=None, mtimes=None):
+        self.training_data = training_data
+        self.threshold_movie_list = threshold_movie_list
+        self.review_counts = review_counts
+        self.movie_data = movie_data
+        self.base_model = base_model
+        self.mtimes = mtimes or {}
+        # Identifies the published files these artifacts were loaded from
+        self.version = hashlib.sha1(json.dumps(sorted(self.mtimes.items())).encode()).hexdigest()[:12]
+
+        # Candidate masks are derived from the threshold list and review counts
+        self.movie_index = MovieIndex(threshold_movie_list, review_counts) if threshold_movie_list is not None else None
+
+
+_artifacts = None
+_reload_requested = False
+_lock = threading.Lock()
+# Callbacks run with the new artifacts every time they are loaded
+_load_listeners = []
+
+
+def _get_mtimes():
+    mtimes = {}
+    for name, path in ARTIFACT_PATHS.items():
+        try:
+            mtimes[name] = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            mtimes[name] = None
+    return mtimes
+
+
+def _load_pickle(path):
+    with open(path, "rb") as fp:
+        return pickle.load(fp)
+
+
+_LOADERS = {
+    "training_data": load_training_data,
+    "threshold_movie_list": _load_pickle,
+    "review_counts": pd.read_csv,
+    "movie_data": load_movie_snapshot,
+    "base_model": BaseModel.load,
+}
+
+
+def load_artifacts():
+    """
+    Read every artifact from disk.
+
+    Returns:
+        Artifacts: The freshly loaded artifacts.
+    """
+    mtimes = _get_mtimes()
+    loaded = {}
+    for name, path in ARTIFACT_PATHS.items():
+        try:
+            loaded[name] = _LOADERS[name](path)
+        except FileNotFoundError:
+            logger.warning(f"Artefato {name} não encontrado em {path}")
+            loaded[name] = None
+
+    return Artifacts(mtimes=mtimes, **loaded)
+
+
+def reload_artifacts():
+    """
+    Replace the process-wide artifacts with a fresh copy from disk.
+
+    Returns:
+        Artifacts: The reloaded artifacts.
+    """
+    global _artifacts, _reload_requested
+    with _lock:
+        _reload_requested = False
+        _artifacts = load_artifacts()
+        logger.info("Artefatos carregados")
+        for listener in _load_listeners:
+            try:
+                listener(_artifacts)
+            except Exception as e:
+                logger.error(f"Erro ao notificar carga dos artefatos: {str(e)}")
+        return _artifacts
+
+
+def on_load(listener):
+    """
+    Register a callback run with the new artifacts every time they are loaded or reloaded.
+    Registering the same callback again has no effect.
+
+    Parameters:
+        listener (callable): Receives the loaded Artifacts.
+    """
+    if listener not in _load_listeners:
+        _load_listeners.append(listener)
+
+
+def get_artifacts():
+    """
+    Return the process-wide artifacts, loading them on first use.
+
+    Returns:
+        Artifacts: The loaded artifacts.
+    """
+    artifacts = _artifacts
+    if artifacts is None:
+        artifacts = reload_artifacts()
+    return artifacts
+
+
+def request_reload():
+    """
+    Force the next `refresh_if_stale` call to reload the artifacts. Safe to call from a
+    signal handler, since it only sets a flag.
+    """
+    global _reload_requested
+    _reload_requested = True
+
+
+def refresh_if_stale():
+    """
+    Reload the artifacts if the refresh pipeline has published new files since they were loaded,
+    or if a reload was requested. This only costs a stat() per artifact, so it is cheap enough
+    to call before every job.
+
+    Returns:
+        bool: True if the artifacts were reloaded.
+    """
+    if not _reload_requested and _artifacts is not None and _artifacts.mtimes == _get_mtimes():
+        return False
+
+    reload_artifacts()
+    return True
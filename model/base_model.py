@@ -0,0 +1,150 @@
+import sys
+import os
+
+# Adiciona o diretório raiz do projeto ao Python Path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+import numpy as np
+from surprise import Prediction
+
+BASE_MODEL_PATH = "model/base_model.npz"
+
+
+class BaseModel:
+    """
+    Frozen item side of a trained SVD model (global mean, item biases and item factors).
+
+    The base model is trained offline by the refresh pipeline and persisted to disk, so
+    recommendation jobs only have to solve the requesting user's bias and factor vector
+    against it instead of retraining the whole model.
+    """
+
+    def __init__(self, global_mean, bi, qi, item_ids, rating_scale=(1, 10)):
+        self.global_mean = float(global_mean)
+        self.bi = np.asarray(bi, dtype=np.float64)
+        self.qi = np.asarray(qi, dtype=np.float64)
+        self.item_ids = np.asarray(item_ids, dtype=str)
+        self.rating_scale = tuple(rating_scale)
+        self.item_index = {movie_id: i for i, movie_id in enumerate(self.item_ids)}
+
+    @classmethod
+    def from_algo(cls, algo):
+        """
+        Extract the item side of a fitted surprise SVD algorithm.
+
+        Parameters:
+            algo (SVD): A fitted surprise SVD model.
+
+        Returns:
+            BaseModel: The frozen base model.
+        """
+        trainset = algo.trainset
+        item_ids = [trainset.to_raw_iid(i) for i in range(trainset.n_items)]
+        return cls(trainset.global_mean, algo.bi, algo.qi, item_ids, trainset.rating_scale)
+
+    @classmethod
+    def load(cls, path=BASE_MODEL_PATH):
+        """
+        Load a base model previously written with `save`.
+
+        Parameters:
+            path (str): Path of the .npz artifact.
+
+        Returns:
+            BaseModel: The loaded base model.
+        """
+        with np.load(path) as artifact:
+            return cls(
+                artifact["global_mean"],
+                artifact["bi"],
+                artifact["qi"],
+                artifact["item_ids"],
+                tuple(artifact["rating_scale"]),
+            )
+
+    def save(self, path=BASE_MODEL_PATH):
+        """
+        Persist the base model as an uncompressed .npz artifact.
+
+        Parameters:
+            path (str): Destination path.
+        """
+        # np.savez appends ".npz" to paths without it, so write through a file handle
+        with open(path, "wb") as fp:
+            np.savez(
+                fp,
+                global_mean=np.float64(self.global_mean),
+                bi=self.bi,
+                qi=self.qi,
+                item_ids=self.item_ids,
+                rating_scale=np.asarray(self.rating_scale, dtype=np.float64),
+            )
+
+    def fold_in(self, username, user_data, reg=0.02):
+        """
+        Solve the user's bias and factor vector against the frozen item factors.
+
+        This is the regularized least-squares problem
+        min sum((r - mu - b_i - b_u - q_i . p_u)^2) + reg * n * (b_u^2 + |p_u|^2),
+        solved in closed form. The regularization is scaled by the number of ratings
+        to match the per-sample penalty applied by surprise's SGD.
+
+        Parameters:
+            username (str): Username of the client.
+            user_data (list): A list of user ratings data.
+            reg (float): Regularization term for the user bias and factors.
+
+        Returns:
+            FoldInAlgo: A predictor exposing the surprise `predict`/`test` interface.
+        """
+        rated = [
+            (self.item_index[x["movie_id"]], x["rating_val"])
+            for x in user_data
+            if x["rating_val"] > 0 and x["movie_id"] in self.item_index
+        ]
+
+        n_factors = self.qi.shape[1]
+        if not rated:
+            return FoldInAlgo(self, username, 0.0, np.zeros(n_factors))
+
+        items, ratings = map(np.asarray, zip(*rated))
+        z = np.hstack([np.ones((len(items), 1)), self.qi[items]])
+        y = ratings - self.global_mean - self.bi[items]
+
+        a = z.T @ z + reg * len(items) * np.eye(n_factors + 1)
+        x = np.linalg.solve(a, z.T @ y)
+
+        return FoldInAlgo(self, username, x[0], x[1:])
+
+
+class FoldInAlgo:
+    """
+    Predictor for a single folded-in user, compatible with the parts of the surprise
+    algorithm interface used by `run_model` (`predict` and `test`).
+    """
+
+    def __init__(self, base_model, username, bu, pu):
+        self.base_model = base_model
+        self.username = username
+        self.bu = float(bu)
+        self.pu = np.asarray(pu, dtype=np.float64)
+
+    def estimate(self, iid):
+        base = self.base_model
+        est = base.global_mean + self.bu
+        i = base.item_index.get(iid)
+        if i is not None:
+            est += base.bi[i] + np.dot(base.qi[i], self.pu)
+        return est
+
+    def predict(self, uid, iid, r_ui=None, clip=True, verbose=False):
+        est = self.estimate(iid)
+        if clip:
+            lower_bound, higher_bound = self.base_model.rating_scale
+            est = min(higher_bound, max(lower_bound, est))
+
+        return Prediction(uid, iid, r_ui, est, {"was_impossible": False})
+
+    def test(self, testset, verbose=False):
+        return [self.predict(uid, iid, r_ui) for (uid, iid, r_ui) in testset]
@@ -12,6 +12,8 @@ from surprise.dump import dump
 
 import numpy as np
 
+from model.base_model import BaseModel
+
 def build_model(df, user_data):
     """
     Builds a recommendation model using SVD algorithm on the provided ratings data.
@@ -48,6 +50,47 @@ def build_model(df, user_data):
 
     return algo, user_watched_list
 
+
+def build_base_model(df):
+    """
+    Trains the SVD algorithm on the ratings sample and keeps only the item side of it.
+
+    Parameters:
+        df (DataFrame): The DataFrame containing user ratings.
+
+    Returns:
+        BaseModel: The frozen base model used to fold in new users.
+    """
+    np.random.seed(12)
+
+    reader = Reader(rating_scale=(1, 10))
+    data = Dataset.load_from_df(df[["user_id", "movie_id", "rating_val"]], reader)
+
+    algo = SVD()
+    algo.fit(data.build_full_trainset())
+
+    return BaseModel.from_algo(algo)
+
+
+def fold_in_model(base_model, username, user_data):
+    """
+    Builds a recommendation model for the user by folding their ratings into the base model,
+    without retraining the item factors.
+
+    Parameters:
+        base_model (BaseModel): The pretrained base model.
+        username (str): The username for whom the model is being built.
+        user_data (list): A list of user ratings data.
+
+    Returns:
+        algo (FoldInAlgo): The folded-in model for the user.
+        user_watched_list (list): A list of movie IDs that the user has watched.
+    """
+    algo = base_model.fold_in(username, user_data)
+    user_watched_list = [x['movie_id'] for x in user_data]
+
+    return algo, user_watched_list
+
 if __name__ == "__main__":
     import os
     from scraping.get_user_ratings import get_user_data
@@ -5,11 +5,15 @@ import os
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(project_root)
 
+import json
 import pandas as pd
 import pickle
 import pymongo
 
 from db.db_connect import connect_to_db
+from model.build_model import build_base_model
+from model.ratings_store import RatingsStore
+from model.movie_metadata import MOVIE_FIELDS
 
 def get_sample(cursor, iteration_size):
     """
@@ -262,8 +266,9 @@ def create_movie_data_sample(db_client, movie_list):
     """
     movies_cursor = db_client.movies.find({"movie_id": {"$in": movie_list}})
     movie_df = pd.DataFrame(list(movies_cursor))
-    
-    movie_df = movie_df[["movie_id", "image_url", "movie_title", "year_released"]]
+
+    # Metadata fields are also used as the snapshot that hydrates recommendations
+    movie_df = movie_df.reindex(columns=MOVIE_FIELDS)
     movie_df["image_url"] = movie_df["image_url"].fillna("").replace(
         [
             "https://a.ltrbxd.com/resized/",
@@ -271,6 +276,7 @@ def create_movie_data_sample(db_client, movie_list):
         ], 
         ["", ""]
     )
+    movie_df["genres"] = movie_df["genres"].apply(lambda x: json.dumps(x if isinstance(x, list) else []))
 
     return movie_df
 
@@ -313,5 +319,11 @@ if __name__ == "__main__":
         pickle.dump(threshold_movie_list, fp)
 
     training_df.to_csv("./data/training_data.csv", index=False)
+    RatingsStore.from_dataframe(training_df).save("./data/ratings_store")
     review_counts_df.to_csv("./data/review_counts.csv", index=False)
     movie_df.to_csv("./data/movie_data.csv", index=False)
+
+    # Train the base model that recommendation jobs fold new users into
+    print("Training base model")
+    base_model = build_base_model(training_df)
+    base_model.save("model/base_model.npz")
@@ -0,0 +1,95 @@
+import sys
+import os
+
+# Adiciona o diretório raiz do projeto ao Python Path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+import numpy as np
+
+# Review count ceilings selectable through the popularity_filter request parameter
+popularity_thresholds_500k_samples = [2500, 2000, 1500, 1000, 700, 400, 250, 150]
+
+
+class MovieIndex:
+    """
+    Candidate movies for recommendations, with precomputed masks for each popularity tier.
+
+    Movies are addressed by their position in the threshold movie list, so building the
+    candidate set for a request is a couple of vectorized mask operations.
+    """
+
+    def __init__(self, threshold_movie_list, review_counts=None, thresholds=popularity_thresholds_500k_samples):
+        self.movie_ids = list(threshold_movie_list)
+        self.movie_codes = {movie_id: i for i, movie_id in enumerate(self.movie_ids)}
+
+        # Without review counts the popularity filter is skipped; with them, movies without
+        # a count never pass it
+        self.review_counts = None
+        self.popularity_masks = {}
+        if review_counts is not None:
+            self.review_counts = np.full(len(self.movie_ids), np.iinfo(np.int64).max, dtype=np.int64)
+            for movie_id, count in zip(review_counts["movie_id"], review_counts["count"]):
+                code = self.movie_codes.get(movie_id)
+                if code is not None:
+                    self.review_counts[code] = count
+            self.popularity_masks = {threshold: self.review_counts < threshold for threshold in thresholds}
+        self._item_codes = None
+
+    def __len__(self):
+        return len(self.movie_ids)
+
+    def popularity_mask(self, popularity_threshold=None):
+        """
+        Mask of the movies with fewer reviews than the threshold. Every movie passes when the
+        review counts weren't loaded.
+
+        Parameters:
+            popularity_threshold (int): Maximum review count (optional).
+
+        Returns:
+            ndarray: Boolean mask over the index.
+        """
+        if not popularity_threshold or self.review_counts is None:
+            return np.ones(len(self.movie_ids), dtype=bool)
+
+        mask = self.popularity_masks.get(popularity_threshold)
+        if mask is None:
+            mask = self.review_counts < popularity_threshold
+        return mask
+
+    def candidates(self, popularity_threshold=None, watched=()):
+        """
+        Positions of the movies that pass the popularity filter and haven't been watched.
+
+        Parameters:
+            popularity_threshold (int): Maximum review count (optional).
+            watched (list): List of movie IDs the user has watched.
+
+        Returns:
+            ndarray: Positions in the index, in threshold list order.
+        """
+        mask = self.popularity_mask(popularity_threshold).copy()
+
+        movie_codes = self.movie_codes
+        watched_codes = [code for code in map(movie_codes.get, watched) if code is not None]
+        mask[watched_codes] = False
+
+        return np.flatnonzero(mask)
+
+    def item_codes(self, factors):
+        """
+        Model item index of every movie in the index. The mapping is cached for the last
+        model seen, so it is only rebuilt when the model changes.
+
+        Parameters:
+            factors (UserFactors): Factors of the model being scored.
+
+        Returns:
+            ndarray: Item indices, -1 for movies unknown to the model.
+        """
+        cached = self._item_codes
+        if cached is None or cached[0] is not factors.item_index:
+            cached = (factors.item_index, factors.item_codes(self.movie_ids))
+            self._item_codes = cached
+        return cached[1]
@@ -0,0 +1,115 @@
+import sys
+import os
+import json
+import logging
+
+# Adiciona o diretório raiz do projeto ao Python Path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+MOVIE_DATA_PATH = "data/movie_data.csv"
+MOVIE_FIELDS = ["image_url", "movie_id", "movie_title", "year_released", "genres", "original_language", "popularity", "runtime", "release_date"]
+INTEGER_FIELDS = ["year_released", "runtime"]
+REDIS_KEY = "movie_data:{}"
+REDIS_TTL = int(os.environ.get('MOVIE_DATA_CACHE_TTL', 24 * 3600))
+
+
+def load_movie_snapshot(path=MOVIE_DATA_PATH):
+    """
+    Load the movie metadata snapshot written by the refresh pipeline.
+
+    Parameters:
+        path (str): Path of the snapshot CSV.
+
+    Returns:
+        dict: Movie metadata keyed by movie ID. Empty if the snapshot predates the
+            genre, runtime and popularity columns, so lookups fall through to Redis and Mongo.
+    """
+    df = pd.read_csv(path)
+    missing_fields = [x for x in MOVIE_FIELDS if x not in df.columns]
+    if missing_fields:
+        logger.warning(f"Snapshot de filmes sem os campos {missing_fields}, ignorando")
+        return {}
+
+    df = df[MOVIE_FIELDS].astype(object).where(df[MOVIE_FIELDS].notna(), None)
+
+    snapshot = {}
+    for movie in df.to_dict("records"):
+        movie["genres"] = json.loads(movie["genres"]) if movie["genres"] else []
+        for field in INTEGER_FIELDS:
+            if movie[field] is not None:
+                movie[field] = int(movie[field])
+        snapshot[movie["movie_id"]] = movie
+
+    return snapshot
+
+
+class MovieMetadataCache:
+    """
+    Tiered lookup of the metadata attached to recommendations: an in-process dictionary
+    seeded from the snapshot, then Redis with a TTL, then Mongo for whatever is left.
+    Movies found in a lower tier are copied into the tiers above it.
+    """
+
+    def __init__(self, snapshot=None, redis_conn=None, db_factory=None, ttl=REDIS_TTL):
+        self.local = dict(snapshot or {})
+        self.redis_conn = redis_conn
+        self.db_factory = db_factory
+        self.ttl = ttl
+
+    def get_many(self, movie_ids):
+        """
+        Fetch the metadata of several movies.
+
+        Parameters:
+            movie_ids (list): List of movie IDs.
+
+        Returns:
+            dict: Movie metadata keyed by movie ID. Movies not found anywhere are left out.
+        """
+        found = {x: self.local[x] for x in movie_ids if x in self.local}
+        missing = [x for x in movie_ids if x not in found]
+
+        if missing and self.redis_conn is not None:
+            cached = self._get_from_redis(missing)
+            found.update(cached)
+            self.local.update(cached)
+            missing = [x for x in missing if x not in cached]
+
+        if missing and self.db_factory is not None:
+            fetched = self._get_from_db(missing)
+            found.update(fetched)
+            self.local.update(fetched)
+            if self.redis_conn is not None:
+                self._set_in_redis(fetched)
+
+        return found
+
+    def _get_from_redis(self, movie_ids):
+        try:
+            values = self.redis_conn.mget([REDIS_KEY.format(x) for x in movie_ids])
+        except Exception as e:
+            logger.error(f"Erro ao ler filmes do Redis: {str(e)}")
+            return {}
+        return {movie_id: json.loads(value) for movie_id, value in zip(movie_ids, values) if value}
+
+    def _set_in_redis(self, movies):
+        if not movies:
+            return
+        try:
+            with self.redis_conn.pipeline(transaction=False) as pipe:
+                for movie_id, movie in movies.items():
+                    pipe.set(REDIS_KEY.format(movie_id), json.dumps(movie, default=str), ex=self.ttl)
+                pipe.execute()
+        except Exception as e:
+            logger.error(f"Erro ao gravar filmes no Redis: {str(e)}")
+
+    def _get_from_db(self, movie_ids):
+        db = self.db_factory()
+        projection = {k: 1 for k in MOVIE_FIELDS}
+        projection["_id"] = 0
+        return {x["movie_id"]: x for x in db.movies.find({"movie_id": {"$in": movie_ids}}, projection)}
@@ -0,0 +1,186 @@
+import sys
+import os
+
+# Adiciona o diretório raiz do projeto ao Python Path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+import time
+import shutil
+import numpy as np
+import pandas as pd
+
+RATINGS_STORE_PATH = "data/ratings_store"
+
+COLUMN_FILES = {
+    "user_codes": "user_codes.npy",
+    "movie_codes": "movie_codes.npy",
+    "ratings": "ratings.npy",
+}
+VOCAB_FILES = {
+    "users": "users.txt",
+    "movies": "movies.txt",
+}
+# Name of the version directory currently published, inside the store directory
+CURRENT_FILE = "CURRENT"
+
+
+def current_version_dir(directory=RATINGS_STORE_PATH):
+    """
+    Directory holding the published version of a store. Stores saved before versioning
+    keep their files directly in `directory`.
+    """
+    try:
+        with open(os.path.join(directory, CURRENT_FILE), encoding="utf-8") as fp:
+            return os.path.join(directory, fp.read().strip())
+    except FileNotFoundError:
+        return directory
+
+
+class RatingsStore:
+    """
+    Columnar, integer-encoded ratings table.
+
+    Ratings are kept as three parallel arrays (int32 user codes, int32 movie codes and
+    uint8 rating values) plus the slug vocabularies used to decode them. When loaded from
+    disk the arrays are memory-mapped, so taking the first N rows only touches those rows.
+    """
+
+    def __init__(self, user_codes, movie_codes, ratings, users, movies):
+        self.user_codes = user_codes
+        self.movie_codes = movie_codes
+        self.ratings = ratings
+        self.users = np.asarray(users, dtype=object)
+        self.movies = np.asarray(movies, dtype=object)
+        self._movie_index = None
+
+    def __len__(self):
+        return len(self.ratings)
+
+    @property
+    def movie_index(self):
+        """Mapping of movie slug to movie code."""
+        if self._movie_index is None:
+            self._movie_index = {movie_id: i for i, movie_id in enumerate(self.movies)}
+        return self._movie_index
+
+    @classmethod
+    def from_dataframe(cls, df):
+        """
+        Encode a ratings DataFrame with "user_id", "movie_id" and "rating_val" columns.
+
+        Parameters:
+            df (DataFrame): The DataFrame containing user ratings.
+
+        Returns:
+            RatingsStore: The in-memory store, with rows in the DataFrame's order.
+        """
+        user_codes, users = pd.factorize(df["user_id"])
+        movie_codes, movies = pd.factorize(df["movie_id"])
+        return cls(
+            user_codes.astype(np.int32),
+            movie_codes.astype(np.int32),
+            df["rating_val"].to_numpy(dtype=np.uint8),
+            users.to_numpy(dtype=object),
+            movies.to_numpy(dtype=object),
+        )
+
+    @classmethod
+    def load(cls, directory=RATINGS_STORE_PATH, mmap=True):
+        """
+        Load a store written with `save`.
+
+        Parameters:
+            directory (str): Directory holding the store.
+            mmap (bool): Memory-map the columns instead of reading them into memory.
+
+        Returns:
+            RatingsStore: The loaded store.
+        """
+        directory = current_version_dir(directory)
+        mmap_mode = "r" if mmap else None
+        columns = {
+            name: np.load(os.path.join(directory, filename), mmap_mode=mmap_mode)
+            for name, filename in COLUMN_FILES.items()
+        }
+        vocabs = {}
+        for name, filename in VOCAB_FILES.items():
+            with open(os.path.join(directory, filename), encoding="utf-8") as fp:
+                vocabs[name] = fp.read().splitlines()
+
+        return cls(**columns, **vocabs)
+
+    def save(self, directory=RATINGS_STORE_PATH):
+        """
+        Write the store to a new version directory and then publish it by atomically replacing
+        the CURRENT pointer, so readers load either the previous version or the new one and
+        never a mix of both. The version replaced is kept for readers still loading it; older
+        ones are removed.
+
+        Parameters:
+            directory (str): Destination directory.
+        """
+        os.makedirs(directory, exist_ok=True)
+        previous = os.path.basename(current_version_dir(directory))
+        version = f"v{time.time_ns()}"
+        version_dir = os.path.join(directory, version)
+        os.makedirs(version_dir)
+
+        for name, filename in COLUMN_FILES.items():
+            with open(os.path.join(version_dir, filename), "wb") as fp:
+                np.save(fp, np.ascontiguousarray(getattr(self, name)))
+
+        for name, filename in VOCAB_FILES.items():
+            with open(os.path.join(version_dir, filename), "w", encoding="utf-8") as fp:
+                fp.write("\n".join(getattr(self, name)))
+
+        tmp_path = os.path.join(directory, f".{CURRENT_FILE}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as fp:
+            fp.write(version)
+        os.replace(tmp_path, os.path.join(directory, CURRENT_FILE))
+
+        for entry in os.listdir(directory):
+            path = os.path.join(directory, entry)
+            if entry.startswith("v") and entry not in (version, previous) and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+
+    def head(self, n):
+        """
+        Decode the first N ratings into a DataFrame.
+
+        Parameters:
+            n (int): Number of rows.
+
+        Returns:
+            DataFrame: A DataFrame with "user_id", "movie_id" and "rating_val" columns.
+        """
+        return pd.DataFrame({
+            "user_id": self.users[self.user_codes[:n]],
+            "movie_id": self.movies[self.movie_codes[:n]],
+            "rating_val": np.asarray(self.ratings[:n], dtype=np.int64),
+        })
+
+
+def load_training_data(directory=RATINGS_STORE_PATH, csv_path="data/ratings.csv"):
+    """
+    Load the training ratings, preferring the columnar store and falling back to a CSV export.
+
+    Parameters:
+        directory (str): Directory holding the columnar store.
+        csv_path (str): CSV export used when the store has not been built.
+
+    Returns:
+        RatingsStore: The training ratings.
+    """
+    try:
+        return RatingsStore.load(directory)
+    except FileNotFoundError:
+        return RatingsStore.from_dataframe(pd.read_csv(csv_path))
+
+
+if __name__ == "__main__":
+    # Convert a ratings CSV export (e.g. data/ratings.csv) into the columnar store
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else "data/ratings.csv"
+    store = RatingsStore.from_dataframe(pd.read_csv(csv_path))
+    store.save(RATINGS_STORE_PATH)
+    print(f"Stored {len(store)} ratings ({len(store.users)} users, {len(store.movies)} movies) in {RATINGS_STORE_PATH}")
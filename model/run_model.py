@@ -14,28 +14,12 @@ import random
 import pymongo
 import pickle
 
-try:
-    from db.db_config import config
-except ImportError:
-    config = None
+from db.db_connect import get_db
+from model.movie_index import MovieIndex
+from model.movie_metadata import MovieMetadataCache
+from model.scoring import get_user_factors, score_items, top_k
 
-def get_top_n(predictions, n=20):
-    """
-    Get the top N recommendations from the prediction list.
-
-    Parameters:
-        predictions (list): List of predictions.
-        n (int): Number of top recommendations to return.
-
-    Returns:
-        list: A list of top N recommendations.
-    """
-    top_n = [(iid, est) for _, iid, _, est, _ in predictions]
-    top_n.sort(key=lambda x: x[1], reverse=True)  # Remove randomness
-    return top_n[:n]
-
-
-def run_model(username, algo, user_watched_list, threshold_movie_list, num_recommendations=20):
+def run_model(username, algo, user_watched_list, movie_index, num_recommendations=20, popularity_threshold=None, movie_cache=None):
     """
     Run the recommendation model for a given user and return movie recommendations.
 
@@ -43,50 +27,39 @@ def run_model(username, algo, user_watched_list, threshold_movie_list, num_recom
         username (str): The username for whom to make recommendations.
         algo: The trained recommendation algorithm.
         user_watched_list (list): List of movies the user has watched.
-        threshold_movie_list (list): List of all movies considered for recommendations.
+        movie_index (MovieIndex): Index of all movies considered for recommendations.
         num_recommendations (int): Number of recommendations to generate.
+        popularity_threshold (int): Threshold for filtering popular movies (optional).
+        movie_cache (MovieMetadataCache): Cache used to attach movie data (optional,
+            defaults to querying Mongo directly).
 
     Returns:
         list: A list of recommended movies.
     """
-    # Connect to MongoDB Client
-    db_name = config["MONGO_DB"] if config else os.environ.get('MONGO_DB', '')
-    
-    if config and config["CONNECTION_URL"]:
-        connection_url = config["CONNECTION_URL"]
-    else:
-        connection_url = os.environ.get('CONNECTION_URL', '')
-
-    try:
-        client = pymongo.MongoClient(connection_url, server_api=pymongo.server_api.ServerApi('1'))
-        db = client[db_name]
-    except Exception as e:
-        print(f"Error connecting to MongoDB: {e}")
-        return []
-
-    unwatched_movies = [x for x in threshold_movie_list if x not in user_watched_list]
-    prediction_set = [(username, x, 0) for x in unwatched_movies]
-
-    predictions = algo.test(prediction_set)
-    top_n = get_top_n(predictions, num_recommendations)
-
-    movie_fields = ["image_url", "movie_id", "movie_title", "year_released", "genres", "original_language", "popularity", "runtime", "release_date"]
-    movie_data = {x["movie_id"]: {k: v for k, v in x.items() if k in movie_fields} for x in db.movies.find({"movie_id": {"$in": [x[0] for x in top_n]}})}
+    if movie_cache is None:
+        movie_cache = MovieMetadataCache(db_factory=get_db)
 
-    return_object = [{
-        "movie_id": x[0],
-        "predicted_rating": round(x[1], 3),
-        "unclipped_rating": round(x[1], 3),
-        "movie_data": movie_data[x[0]]
-    } for x in top_n]
+    candidates = movie_index.candidates(popularity_threshold, user_watched_list)
 
-    for i, prediction in enumerate(return_object):
-        if prediction['predicted_rating'] == 10:
-            return_object[i]['unclipped_rating'] = float(algo.predict(username, prediction["movie_id"], clip=False).est)
+    # Score every candidate in one vectorized pass and keep the top N by unclipped estimate
+    factors = get_user_factors(algo, username)
+    scores = score_items(factors, movie_index.item_codes(factors)[candidates])
+    top_indices = top_k(scores, num_recommendations)
 
-    return_object.sort(key=lambda x: x["unclipped_rating"], reverse=True)
-    return return_object
+    lower_bound, higher_bound = factors.rating_scale
+    top_n = [(movie_index.movie_ids[candidates[i]], float(scores[i])) for i in top_indices]
 
+    # Hydrate the recommendations from the metadata cache, only reaching Mongo on a miss
+    movie_data = movie_cache.get_many([x[0] for x in top_n])
+
+    return_object = [{
+        "movie_id": movie_id,
+        "predicted_rating": round(min(higher_bound, max(lower_bound, est)), 3),
+        "unclipped_rating": round(est, 3),
+        "movie_data": movie_data.get(movie_id, {})
+    } for movie_id, est in top_n]
+
+    return return_object
 
 if __name__ == "__main__":
     with open("model/user_watched.txt", "rb") as fp:
@@ -97,5 +70,8 @@ if __name__ == "__main__":
 
     algo = dump.load("model/mini_model.pkl")[1]
 
-    recs = run_model("wiped_issues", algo, user_watched_list, threshold_movie_list, 25)
+    review_counts = pd.read_csv("data/review_counts.csv")
+    movie_index = MovieIndex(threshold_movie_list, review_counts)
+
+    recs = run_model("wiped_issues", algo, user_watched_list, movie_index, 25)
     print(recs)
@@ -0,0 +1,103 @@
+import sys
+import os
+
+# Adiciona o diretório raiz do projeto ao Python Path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+import numpy as np
+
+from model.base_model import FoldInAlgo
+
+
+class UserFactors:
+    """
+    Everything needed to score one user against every item of an SVD model:
+    the global mean, the user's bias and factors, and the item biases and factors.
+    """
+
+    def __init__(self, global_mean, bu, pu, bi, qi, item_index, rating_scale):
+        self.global_mean = global_mean
+        self.bu = bu
+        self.pu = pu
+        self.bi = bi
+        self.qi = qi
+        self.item_index = item_index
+        self.rating_scale = rating_scale
+
+    def item_codes(self, movie_ids):
+        """
+        Map movie IDs to the model's item indices, using -1 for movies the model doesn't know.
+
+        Parameters:
+            movie_ids (list): List of movie IDs.
+
+        Returns:
+            ndarray: The item indices.
+        """
+        item_index = self.item_index
+        return np.fromiter((item_index.get(x, -1) for x in movie_ids), dtype=np.int64, count=len(movie_ids))
+
+
+def get_user_factors(algo, username):
+    """
+    Extract the factors of a user from either a folded-in model or a surprise SVD model.
+
+    Parameters:
+        algo: The trained recommendation algorithm.
+        username (str): The username to score.
+
+    Returns:
+        UserFactors: The user's and items' factors.
+    """
+    if isinstance(algo, FoldInAlgo):
+        base = algo.base_model
+        return UserFactors(base.global_mean, algo.bu, algo.pu, base.bi, base.qi, base.item_index, base.rating_scale)
+
+    trainset = algo.trainset
+    u = trainset._raw2inner_id_users.get(username)
+    if u is not None:
+        bu, pu = algo.bu[u], algo.pu[u]
+    else:
+        # Unknown users are scored from the global mean and item biases only, as surprise does
+        bu, pu = 0.0, None
+
+    return UserFactors(trainset.global_mean, bu, pu, algo.bi, algo.qi, trainset._raw2inner_id_items, trainset.rating_scale)
+
+
+def score_items(factors, item_codes):
+    """
+    Compute the unclipped estimate mu + b_u + b_i + q_i . p_u for every item in one pass.
+    Items unknown to the model (code -1) are scored as mu + b_u.
+
+    Parameters:
+        factors (UserFactors): The user's and items' factors.
+        item_codes (ndarray): Item indices to score.
+
+    Returns:
+        ndarray: The unclipped estimates.
+    """
+    item_scores = factors.bi if factors.pu is None else factors.bi + factors.qi @ factors.pu
+
+    known = item_codes >= 0
+    scores = np.full(len(item_codes), factors.global_mean + factors.bu, dtype=np.float64)
+    scores[known] += item_scores[item_codes[known]]
+    return scores
+
+
+def top_k(scores, k):
+    """
+    Indices of the K highest scores, in descending order of score.
+
+    Parameters:
+        scores (ndarray): The scores.
+        k (int): Number of indices to return.
+
+    Returns:
+        ndarray: The selected indices.
+    """
+    if k >= len(scores):
+        return np.argsort(-scores, kind="stable")
+
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind="stable")]
@@ -0,0 +1,204 @@
+import sys
+import os
+
+# Adiciona o diretório raiz do projeto ao Python Path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+import argparse
+import glob
+import statistics
+import time
+import tracemalloc
+
+import requests
+from bs4 import BeautifulSoup
+
+from scraping import extract
+
+# Compara a extração direcionada (scraping/extract.py) com o código anterior baseado no
+# BeautifulSoup, sobre páginas salvas do Letterboxd:
+#
+#   python scraping/benchmark_extract.py --save --user <username> --film <slug>
+#   python scraping/benchmark_extract.py
+#
+# As páginas ficam em FIXTURES_DIR/<tipo>/*.html, com tipo ratings, profile, film ou poster.
+
+FIXTURES_DIR = os.path.join(project_root, "data", "fixtures")
+
+PAGE_URLS = {
+    "ratings": "https://letterboxd.com/{}/films/by/date/page/1/",
+    "profile": "https://letterboxd.com/{}/films/by/date",
+    "film": "https://letterboxd.com/film/{}/",
+    "poster": "https://letterboxd.com/ajax/poster/film/{}/hero/230x345",
+}
+
+
+def soup_ratings(content, return_unrated=True):
+    """Extração anterior de generate_ratings_operations."""
+    soup = BeautifulSoup(content, "lxml")
+    ratings = []
+    for review in soup.find_all("li", class_="poster-container"):
+        try:
+            movie_id = review.find("div", class_="film-poster")["data-target-link"].split("/")[-2]
+            rating = review.find("span", class_="rating")
+            if rating:
+                rating_val = int(rating["class"][-1].split("-")[-1])
+            elif return_unrated:
+                rating_val = -1
+            else:
+                continue
+            ratings.append((movie_id, rating_val))
+        except (KeyError, AttributeError, IndexError):
+            continue
+    return ratings
+
+
+def soup_profile(content):
+    """Extração anterior de get_page_count."""
+    soup = BeautifulSoup(content, "lxml")
+    body = soup.find("body")
+    try:
+        if "error" in body["class"]:
+            return -1, None
+    except KeyError:
+        return -1, None
+    try:
+        page_link = soup.find_all("li", attrs={"class": "paginate-page"})[-1]
+        num_pages = int(page_link.find("a").text.replace(",", ""))
+        display_name = (
+            body.find("section", attrs={"class": "profile-header"})
+            .find("h1", attrs={"class": "title-3"})
+            .text.strip()
+        )
+    except IndexError:
+        num_pages = 1
+        display_name = None
+    return num_pages, display_name
+
+
+def _soup_external_id(soup, action, marker):
+    try:
+        link = soup.find("a", attrs={"data-track-action": action})['href']
+        return link, link.split(marker)[1].strip('/').split('/')[0]
+    except (TypeError, IndexError):
+        return '', ''
+
+
+def soup_film(content):
+    """Extração anterior de fetch_letterboxd."""
+    soup = BeautifulSoup(content, "lxml")
+    movie_header = soup.find('section', attrs={'class': 'film-header-group'})
+    if movie_header:
+        title_element = movie_header.find('h1', attrs={'class': 'headline-1 filmtitle'})
+        movie_title = title_element.find('span', attrs={'class': 'name'}).text.strip() if title_element else ''
+        year_element = movie_header.find('div', attrs={'class': 'releaseyear'})
+        year = int(year_element.find('a').text.strip()) if year_element else None
+    else:
+        movie_title = ''
+        year = None
+    imdb_link, imdb_id = _soup_external_id(soup, "IMDb", '/title')
+    tmdb_link, tmdb_id = _soup_external_id(soup, "TMDb", '/movie')
+    return {
+        "movie_title": movie_title,
+        "year_released": year,
+        "imdb_link": imdb_link,
+        "tmdb_link": tmdb_link,
+        "imdb_id": imdb_id,
+        "tmdb_id": tmdb_id,
+    }
+
+
+def soup_poster(content):
+    """Extração anterior de fetch_poster."""
+    soup = BeautifulSoup(content, "lxml")
+    try:
+        image_url = soup.find('div', attrs={'class': 'film-poster'}).find('img')['src'].split('?')[0]
+        if 'https://s.ltrbxd.com/static/img/empty-poster' in image_url:
+            return ''
+        return image_url.replace('https://a.ltrbxd.com/resized/', '').split('.jpg')[0]
+    except AttributeError:
+        return ''
+
+
+EXTRACTORS = {
+    "ratings": (soup_ratings, lambda content: extract.extract_ratings(content, return_unrated=True)),
+    "profile": (soup_profile, extract.extract_profile),
+    "film": (soup_film, extract.extract_film),
+    "poster": (soup_poster, extract.extract_image_url),
+}
+
+
+def save_fixtures(fixtures_dir, usernames, films):
+    """Baixa as páginas dos usuários e filmes informados para o diretório de fixtures."""
+    targets = [("ratings", u) for u in usernames] + [("profile", u) for u in usernames]
+    targets += [("film", f) for f in films] + [("poster", f) for f in films]
+
+    for kind, name in targets:
+        r = requests.get(PAGE_URLS[kind].format(name))
+        r.raise_for_status()
+        os.makedirs(os.path.join(fixtures_dir, kind), exist_ok=True)
+        path = os.path.join(fixtures_dir, kind, f"{name}.html")
+        with open(path, "wb") as f:
+            f.write(r.content)
+        print(f"Salvo {path} ({len(r.content)} bytes)")
+
+
+def measure(func, content, repeat):
+    """Mediana do tempo por chamada (ms) e pico de memória alocada (KiB)."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(content)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    func(content)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return statistics.median(timings), peak / 1024
+
+
+def run_benchmark(fixtures_dir, repeat):
+    print(f"{'página':<40} {'soup ms':>9} {'lxml ms':>9} {'ganho':>7} {'soup KiB':>10} {'lxml KiB':>10}  saída")
+    found = False
+    for kind, (soup_func, lxml_func) in EXTRACTORS.items():
+        for path in sorted(glob.glob(os.path.join(fixtures_dir, kind, "*.html"))):
+            found = True
+            with open(path, "rb") as f:
+                content = f.read()
+
+            same_output = soup_func(content) == lxml_func(content)
+            soup_ms, soup_kib = measure(soup_func, content, repeat)
+            lxml_ms, lxml_kib = measure(lxml_func, content, repeat)
+
+            name = f"{kind}/{os.path.basename(path)}"
+            print(
+                f"{name:<40} {soup_ms:>9.2f} {lxml_ms:>9.2f} {soup_ms / lxml_ms:>6.1f}x "
+                f"{soup_kib:>10.0f} {lxml_kib:>10.0f}  {'igual' if same_output else 'DIFERENTE'}"
+            )
+
+    if not found:
+        print(f"Nenhuma página em {fixtures_dir}. Use --save para baixar páginas.")
+    else:
+        # A árvore do libxml2 é alocada em C, fora do alcance do tracemalloc
+        print("\nKiB: pico de memória alocada pelo Python (tracemalloc), sem as alocações em C do libxml2.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da extração de páginas do Letterboxd")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help="Diretório das páginas salvas")
+    parser.add_argument("--repeat", type=int, default=20, help="Execuções por página")
+    parser.add_argument("--save", action="store_true", help="Baixa as páginas antes do benchmark")
+    parser.add_argument("--user", action="append", default=[], help="Usuário cujas páginas serão salvas")
+    parser.add_argument("--film", action="append", default=[], help="Slug do filme cujas páginas serão salvas")
+    args = parser.parse_args()
+
+    if args.save:
+        save_fixtures(args.fixtures, args.user, args.film)
+    run_benchmark(args.fixtures, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
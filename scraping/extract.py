@@ -0,0 +1,202 @@
+import sys
+import os
+
+# Adiciona o diretório raiz do projeto ao Python Path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from lxml import etree
+
+# Extração direcionada dos dados das páginas do Letterboxd: em vez de montar uma árvore do
+# BeautifulSoup para a página inteira, as páginas são lidas pelo parser HTML do lxml e só os
+# elementos necessários são consultados com XPath pré-compilados.
+
+_PARSER = etree.HTMLParser(remove_comments=True, remove_pis=True, no_network=True)
+_UTF8_PARSER = etree.HTMLParser(remove_comments=True, remove_pis=True, no_network=True, encoding="utf-8")
+
+
+def _has_class(name):
+    """Condição XPath equivalente a `class_=name` do BeautifulSoup (uma das classes do elemento)."""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+_POSTER_CONTAINERS = etree.XPath(f"//li[{_has_class('poster-container')}]")
+_FILM_POSTER_LINK = etree.XPath(f".//div[{_has_class('film-poster')}]/@data-target-link")
+_RATING_CLASS = etree.XPath(f".//span[{_has_class('rating')}]/@class")
+_LAST_PAGE_LINK = etree.XPath(f"(//li[{_has_class('paginate-page')}])[last()]//a")
+_BODY_CLASS = etree.XPath("//body/@class")
+_DISPLAY_NAME = etree.XPath(f"//section[{_has_class('profile-header')}]//h1[{_has_class('title-3')}]")
+_FILM_HEADER = etree.XPath(f"//section[{_has_class('film-header-group')}]")
+_FILM_TITLE = etree.XPath(f".//h1[@class='headline-1 filmtitle']//span[{_has_class('name')}]")
+_RELEASE_YEAR = etree.XPath(f".//div[{_has_class('releaseyear')}]//a")
+_IMDB_LINK = etree.XPath("//a[@data-track-action='IMDb']/@href")
+_TMDB_LINK = etree.XPath("//a[@data-track-action='TMDb']/@href")
+_POSTER_IMAGE = etree.XPath(f"(//div[{_has_class('film-poster')}])[1]//img/@src")
+
+
+def parse_html(content):
+    """
+    Lê o HTML (bytes ou str) com o lxml. Retorna None para páginas vazias.
+
+    Bytes usam a codificação declarada na página. Uma str é codificada em UTF-8 e lida com um
+    parser fixo em UTF-8; sem isso, uma página sem `<meta charset>` seria lida como latin-1.
+    """
+    if not content:
+        return None
+    if isinstance(content, str):
+        return etree.fromstring(content.encode("utf-8"), _UTF8_PARSER)
+    return etree.fromstring(content, _PARSER)
+
+
+def _text(element):
+    return "".join(element.itertext())
+
+
+def _ratings_from_root(root, return_unrated):
+    ratings = []
+    for review in _POSTER_CONTAINERS(root):
+        links = _FILM_POSTER_LINK(review)
+        if not links:
+            print("Error processing review: 'data-target-link'")
+            continue
+        try:
+            movie_id = links[0].split("/")[-2]
+        except IndexError as e:
+            print(f"Error processing review: {e}")
+            continue
+
+        rating_class = _RATING_CLASS(review)
+        if rating_class:
+            try:
+                rating_val = int(rating_class[0].split()[-1].split("-")[-1])
+            except ValueError as e:
+                print(f"Error processing review: {e}")
+                continue
+        elif return_unrated:
+            rating_val = -1
+        else:
+            continue
+
+        ratings.append((movie_id, rating_val))
+
+    return ratings
+
+
+def _page_count_from_root(root):
+    links = _LAST_PAGE_LINK(root)
+    if not links:
+        return 1
+    return int(_text(links[0]).replace(",", ""))
+
+
+def _profile_from_root(root):
+    body_class = _BODY_CLASS(root)
+    if not body_class or "error" in body_class[0].split():
+        return -1, None
+
+    if not _LAST_PAGE_LINK(root):
+        return 1, None
+
+    display_name = _DISPLAY_NAME(root)
+    return _page_count_from_root(root), _text(display_name[0]).strip() if display_name else None
+
+
+def extract_ratings(content, return_unrated=False):
+    """
+    Extrai as avaliações de uma página de filmes do usuário (films/by/date).
+
+    Parâmetros:
+        content (bytes): HTML da página.
+        return_unrated (bool): Inclui os filmes sem nota, com rating_val -1.
+
+    Retorna:
+        list: Tuplas (movie_id, rating_val), na ordem da página.
+    """
+    root = parse_html(content)
+    return _ratings_from_root(root, return_unrated) if root is not None else []
+
+
+def extract_page_count(content):
+    """Número de páginas da paginação, ou 1 se a página não tiver paginação."""
+    root = parse_html(content)
+    return _page_count_from_root(root) if root is not None else 1
+
+
+def extract_profile(content):
+    """
+    Extrai o número de páginas de avaliações e o nome de exibição do usuário.
+
+    Retorna:
+        tuple: (num_pages, display_name), ou (-1, None) se o usuário não existir.
+    """
+    root = parse_html(content)
+    return _profile_from_root(root) if root is not None else (-1, None)
+
+
+def extract_first_page(content, return_unrated=False):
+    """
+    Extrai da primeira página de avaliações, com uma única leitura do HTML, o número de
+    páginas, o nome de exibição e as avaliações da página.
+
+    Retorna:
+        tuple: (num_pages, display_name, ratings), com num_pages -1 se o usuário não existir.
+    """
+    root = parse_html(content)
+    if root is None:
+        return -1, None, []
+
+    num_pages, display_name = _profile_from_root(root)
+    if num_pages == -1:
+        return -1, None, []
+    return num_pages, display_name, _ratings_from_root(root, return_unrated)
+
+
+def _external_id(links, marker):
+    try:
+        link = links[0]
+        return link, link.split(marker)[1].strip('/').split('/')[0]
+    except IndexError:
+        return '', ''
+
+
+def extract_film(content):
+    """
+    Extrai os dados da página de um filme.
+
+    Retorna:
+        dict: movie_title, year_released, imdb_link, tmdb_link, imdb_id e tmdb_id.
+    """
+    root = parse_html(content)
+    movie_title, year = '', None
+
+    header = _FILM_HEADER(root) if root is not None else []
+    if header:
+        title = _FILM_TITLE(header[0])
+        movie_title = _text(title[0]).strip() if title else ''
+        release_year = _RELEASE_YEAR(header[0])
+        year = int(_text(release_year[0]).strip()) if release_year else None
+
+    imdb_link, imdb_id = _external_id(_IMDB_LINK(root) if root is not None else [], '/title')
+    tmdb_link, tmdb_id = _external_id(_TMDB_LINK(root) if root is not None else [], '/movie')
+
+    return {
+        "movie_title": movie_title,
+        "year_released": year,
+        "imdb_link": imdb_link,
+        "tmdb_link": tmdb_link,
+        "imdb_id": imdb_id,
+        "tmdb_id": tmdb_id,
+    }
+
+
+def extract_image_url(content):
+    """Extrai o caminho do pôster do filme, ou '' se o filme não tiver pôster."""
+    root = parse_html(content)
+    sources = _POSTER_IMAGE(root) if root is not None else []
+    if not sources:
+        return ''
+
+    image_url = sources[0].split('?')[0]
+    if 'https://s.ltrbxd.com/static/img/empty-poster' in image_url:
+        return ''
+    return image_url.replace('https://a.ltrbxd.com/resized/', '').split('.jpg')[0]
@@ -6,15 +6,15 @@ project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(project_root)
 
 from pymongo.operations import UpdateOne
-import requests
+import asyncio
 from bs4 import BeautifulSoup
 from pymongo.errors import BulkWriteError
 from pprint import pprint
 from tqdm import tqdm
-from time import sleep
 import logging
 
 from db.db_connect import connect_to_db
+from scraping.http_client import HttpClient
 
 # Configuração do Logger
 logging.basicConfig(level=logging.INFO)
@@ -28,12 +28,16 @@ users = db.users
 base_url = "https://letterboxd.com/members/popular/this/week/page/{}/"
 total_pages = 128
 
-def scrape_and_update_users(page):
+async def scrape_and_update_users(page, client):
     """Extrai dados de usuários populares e insere/atualiza no MongoDB."""
+    # O HttpClient limita a taxa de requisições e repete as que falharem
+    content = await client.get(base_url.format(page))
+    if content is None:
+        logging.error(f"Erro ao solicitar a página {page}")
+        return
+
     try:
-        r = requests.get(base_url.format(page))
-        r.raise_for_status()  # Checa se a resposta foi bem-sucedida
-        soup = BeautifulSoup(r.text, "html.parser")
+        soup = BeautifulSoup(content, "html.parser")
         
         table = soup.find("table", attrs={"class": "person-table"})
         rows = table.findAll("td", attrs={"class": "table-person"})
@@ -64,15 +68,20 @@ def scrape_and_update_users(page):
             users.bulk_write(update_operations, ordered=False)
             logging.info(f"Usuários da página {page} inseridos/atualizados com sucesso.")
 
-    except requests.RequestException as e:
-        logging.error(f"Erro ao solicitar a página {page}: {e}")
+    except AttributeError:
+        # Páginas de erro (ex.: 404) não têm a tabela de usuários
+        logging.error(f"Página {page} sem a tabela de usuários")
     except BulkWriteError as bwe:
         logging.error("Erro no bulk_write:")
         pprint(bwe.details)
 
-# Loop de scraping com barra de progresso e espera entre requests
-pbar = tqdm(range(1, total_pages + 1))
-for page in pbar:
-    pbar.set_description(f"Scraping página {page} de {total_pages} dos usuários populares")
-    scrape_and_update_users(page)
-    sleep(1)  # Espera de 1 segundo entre requests
+async def main():
+    # Em vez de esperar 1 segundo entre requests, as páginas são buscadas no ritmo do limite do host
+    async with HttpClient() as client:
+        tasks = [asyncio.ensure_future(scrape_and_update_users(page, client)) for page in range(1, total_pages + 1)]
+        pbar = tqdm(asyncio.as_completed(tasks), total=total_pages, desc="Scraping páginas dos usuários populares")
+        for task in pbar:
+            await task
+    print("HTTP:", client.stats())
+
+asyncio.run(main())
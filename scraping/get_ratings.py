@@ -6,208 +6,326 @@ project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(project_root)
 
 import time
-import math
+import hashlib
 import datetime
-from itertools import chain
 import asyncio
-from aiohttp import ClientSession
-from bs4 import BeautifulSoup
+from collections import deque
 from pymongo import UpdateOne
-from pymongo.errors import BulkWriteError
 from tqdm import tqdm
-from pprint import pprint
 
-from db.db_connect import connect_to_db
+from db.db_connect import connect_to_db, get_pool_stats
+from db.bulk_writer import BulkWriter
+from db.change_detection import load_rating_snapshot, changed_rating_operations, skeleton_movie_operations
+from scraping.http_client import HttpClient
+from scraping.extract import extract_ratings, extract_first_page
 from utils import helpers
 
-async def fetch(url, session, input_data={}):
-    try:
-        async with session.get(url) as response:
-            try:
-                return await response.read(), input_data
-            except Exception as e:
-                print(f"Error reading response for {url}: {e}")
-                return None, None
-    except Exception as e:
-        print(f"Error fetching {url}: {e}")
-        return None, None
+# Maximum number of rating pages of a user being fetched or parsed at once
+PAGE_CONCURRENCY = int(os.environ.get('SCRAPE_PAGE_CONCURRENCY', 8))
+# Bulk ratings scrape: pages being fetched or parsed at once across all users
+MAX_IN_FLIGHT = int(os.environ.get('SCRAPE_MAX_IN_FLIGHT', 32))
 
-async def get_page_counts(usernames, users_cursor):
-    url = "https://letterboxd.com/{}/films/"
-    tasks = []
+# Fields of a user document the ratings scrape reads and updates
+USER_STATE_FIELDS = {"_id": 0, "username": 1, "num_ratings_pages": 1, "recent_page_count": 1, "ratings_watermark": 1}
 
-    async with ClientSession() as session:
-        for username in usernames:
-            task = asyncio.ensure_future(
-                fetch(url.format(username), session, {"username": username})
-            )
-            tasks.append(task)
+def load_user_state(users_cursor, usernames):
+    """Load the scrape state of the given users with one projected query, keyed by username."""
+    users = users_cursor.find({"username": {"$in": list(usernames)}}, USER_STATE_FIELDS)
+    return {user["username"]: user for user in users}
 
-        responses = await asyncio.gather(*tasks, return_exceptions=True)
-        # Filter out None responses and exceptions
-        responses = [x for x in responses if x is not None and not isinstance(x, Exception)]
-
-        update_operations = []
-        for response in responses:
-            if not response[0]:  # Skip if response content is None
-                continue
-                
-            soup = BeautifulSoup(response[0], "lxml")
-            try:
-                page_link = soup.findAll("li", class_="paginate-page")[-1]
-                num_pages = int(page_link.find("a").text.replace(",", ""))
-            except (IndexError, AttributeError):
-                num_pages = 1
+async def fetch(url, client, input_data={}):
+    # Rate limiting and retries happen in the HttpClient; None means every attempt failed
+    content = await client.get(url)
+    if content is None:
+        return None, None
+    return content, input_data
 
-            user = users_cursor.find_one({"username": response[1]["username"]})
-            previous_num_pages = user.get("num_ratings_pages", 0)
+def get_recent_page_count(num_pages, previous_num_pages):
+    """Pages to scrape for a user without a watermark, from the previous page count."""
+    return min(num_pages, max(num_pages - previous_num_pages + 1, 10)) if num_pages < 128 else 10
 
-            new_pages = min(num_pages, max(num_pages - previous_num_pages + 1, 10)) if num_pages < 128 else 10
+def page_fingerprint(page_ratings):
+    """Hash of a page's (movie_id, rating_val) entries, in page order."""
+    return hashlib.sha1(repr(list(page_ratings)).encode()).hexdigest()
 
-            update_operations.append(
-                UpdateOne(
-                    {"username": response[1]["username"]},
-                    {
-                        "$set": {
-                            "num_ratings_pages": num_pages,
-                            "recent_page_count": new_pages,
-                            "last_updated": datetime.datetime.now(),
-                        }
-                    },
-                    upsert=True,
-                )
-            )
+def ratings_operations(username, page_ratings, snapshot=None, seen_movies=None):
+    """
+    Upserts for a user's (movie_id, rating_val) entries that are new or changed, and the skeleton of each new movie.
 
-        if update_operations:
-            try:
-                users_cursor.bulk_write(update_operations, ordered=False)
-            except BulkWriteError as bwe:
-                pprint(bwe.details)
+    Parameters:
+        snapshot (dict): The user's stored rating_val by movie_id. Without one every entry is treated as new.
+        seen_movies (set): Movies already upserted in this run, whose skeletons are skipped.
+    """
+    ratings_ops, new_movie_ids = changed_rating_operations(username, page_ratings, snapshot or {})
+    return ratings_ops, skeleton_movie_operations(new_movie_ids, seen_movies)
 
-async def generate_ratings_operations(response, send_to_db=True, return_unrated=False):
+def generate_ratings_operations(response, send_to_db=True, return_unrated=False):
     if not response or not response[0]:  # Skip if response or response content is None
         return [], []
-        
-    soup = BeautifulSoup(response[0], "lxml")
-    reviews = soup.findAll("li", class_="poster-container")
+
+    username = response[1]["username"]
+    page_ratings = extract_ratings(response[0], return_unrated=return_unrated)
+
+    if not send_to_db:
+        return [{"movie_id": movie_id, "rating_val": rating_val, "user_id": username} for movie_id, rating_val in page_ratings], []
+
+    return ratings_operations(username, page_ratings)
+
+async def sliding_window(jobs, run, concurrency):
+    """
+    Run `run(job)` for the jobs of a deque with at most `concurrency` running at once,
+    yielding (job, result) in completion order.
+
+    The next job starts as soon as any running one finishes, so a slow job never holds back
+    the rest. Jobs appended to the deque while iterating are picked up, which lets the
+    consumer schedule follow-up work from a result. Jobs that raise are reported and skipped.
+    """
+    def start_next():
+        if not jobs:
+            return None
+        job = jobs.popleft()
+        task = asyncio.ensure_future(run(job))
+        task.job = job
+        return task
+
+    def refill():
+        while len(pending) < concurrency and (task := start_next()) is not None:
+            pending.add(task)
+
+    pending = set()
+    try:
+        refill()
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            # Refill the window before handing results to the consumer
+            refill()
+            for task in done:
+                try:
+                    result = task.result()
+                except Exception as e:
+                    print(f"Error running {task.job}: {e}")
+                    continue
+                yield task.job, result
+            refill()
+    finally:
+        # Stop if the consumer stops early
+        for task in pending:
+            task.cancel()
+
+async def stream_pages(jobs, client, send_to_db=True, return_unrated=False, concurrency=PAGE_CONCURRENCY, executor=None):
+    """
+    Fetch and parse rating pages from an iterable of (username, page) jobs through a
+    sliding window of `concurrency` pages, yielding each page's (ratings, movies) operations
+    as soon as it is parsed. Parsing runs in `executor` (the loop's default thread pool if
+    None). Pages that fail to download are skipped.
+    """
+    url = "https://letterboxd.com/{}/films/by/date/page/{}/"
+    loop = asyncio.get_running_loop()
+
+    async def fetch_and_parse(job):
+        username, page = job
+        response = await fetch(url.format(username, page), client, {"username": username})
+        if not response[0]:
+            return None
+        return await loop.run_in_executor(executor, generate_ratings_operations, response, send_to_db, return_unrated)
+
+    async for _, parsed in sliding_window(deque(jobs), fetch_and_parse, concurrency):
+        if parsed is not None:
+            yield parsed
+
+async def stream_user_ratings(username, pages, client, send_to_db=True, return_unrated=False, concurrency=PAGE_CONCURRENCY, executor=None):
+    """
+    Fetch and parse a user's rating pages, yielding each page's (ratings, movies) operations
+    as soon as it is parsed. At most `concurrency` pages are in flight, so only that many
+    HTML bodies are held in memory.
+    """
+    jobs = ((username, page) for page in pages)
+    async for parsed in stream_pages(jobs, client, send_to_db, return_unrated, concurrency, executor):
+        yield parsed
+
+async def get_user_ratings(username, db_cursor=None, mongo_db=None, store_in_db=True, num_pages=None, return_unrated=False, pages=None, user_state=None):
+    if pages is None:
+        if not num_pages:
+            user = user_state[username] if user_state is not None else db_cursor.find_one({"username": username}, USER_STATE_FIELDS)
+            num_pages = user["recent_page_count"]
+        pages = range(1, num_pages + 1)
 
     ratings_operations = []
     movie_operations = []
+    num_responses = 0
 
-    for review in reviews:
-        try:
-            movie_id = review.find("div", class_="film-poster")["data-target-link"].split("/")[-2]
-            rating = review.find("span", class_="rating")
-            
-            if rating:
-                rating_val = int(rating["class"][-1].split("-")[-1])
-            elif return_unrated:
-                rating_val = -1
-            else:
-                continue
+    async with HttpClient() as client:
+        async for page_ratings, page_movies in stream_user_ratings(username, pages, client, send_to_db=store_in_db, return_unrated=return_unrated):
+            ratings_operations.extend(page_ratings)
+            movie_operations.extend(page_movies)
+            num_responses += 1
 
-            rating_object = {
-                "movie_id": movie_id,
-                "rating_val": rating_val,
-                "user_id": response[1]["username"],
-            }
-
-            skeleton_movie_object = {"movie_id": movie_id}
+    if not num_responses:
+        print(f"No valid responses for user {username}, skipping...")
+        return [] if not store_in_db else ([], [])
 
-            if not send_to_db:
-                ratings_operations.append(rating_object)
-            else:
-                ratings_operations.append(
-                    UpdateOne(
-                        {"user_id": response[1]["username"], "movie_id": movie_id},
-                        {"$set": rating_object},
-                        upsert=True,
-                    )
-                )
-                movie_operations.append(
-                    UpdateOne(
-                        {"movie_id": movie_id}, {"$set": skeleton_movie_object}, upsert=True
-                    )
-                )
-        except (KeyError, AttributeError, IndexError) as e:
-            print(f"Error processing review: {e}")
-            continue
+    if not store_in_db:
+        return ratings_operations
 
     return ratings_operations, movie_operations
 
-async def get_user_ratings(username, db_cursor=None, mongo_db=None, store_in_db=True, num_pages=None, return_unrated=False):
+async def get_ratings(usernames, db_cursor=None, mongo_db=None, store_in_db=True, writer=None, client=None, user_state=None):
+    """
+    Refresh the ratings of the given users through one sliding window over their pages.
+
+    Page 1 of each user's ratings (newest first) gives the page count and is compared with
+    the user's watermark: a fingerprint of page 1 and the newest film seen on the last
+    refresh. Users whose page 1 is unchanged cost one request. For the others, pages are
+    fetched one after another until the newest film of the last refresh shows up, since
+    everything after it is already stored. Users without a watermark get the previous
+    estimate of pages (`get_recent_page_count`). The new watermark is saved only after the
+    user's ratings have been written, and not at all if one of their pages failed.
+
+    Only new or changed ratings are written: each refreshed user's stored ratings are loaded
+    with one projected query and compared with the scraped ones. Skeleton movie upserts are
+    sent once per movie per run, and only for movies of new ratings.
+    """
+    # Writes go through a write-behind queue so scraping keeps going while Mongo writes
+    if store_in_db and writer is None:
+        async with BulkWriter() as writer:
+            return await get_ratings(usernames, db_cursor, mongo_db, store_in_db, writer, client, user_state)
+
+    if client is None:
+        async with HttpClient() as client:
+            return await get_ratings(usernames, db_cursor, mongo_db, store_in_db, writer, client, user_state)
+
+    if user_state is None:
+        user_state = load_user_state(db_cursor, usernames)
+
     url = "https://letterboxd.com/{}/films/by/date/page/{}/"
+    loop = asyncio.get_running_loop()
 
-    if not num_pages:
-        user = db_cursor.find_one({"username": username})
-        num_pages = user["recent_page_count"]
+    async def fetch_page(job):
+        username, page = job
+        response = await fetch(url.format(username, page), client, {"username": username})
+        if not response[0]:
+            return None
+        return await loop.run_in_executor(None, extract_first_page, response[0], True)
 
-    async with ClientSession() as session:
-        tasks = [asyncio.ensure_future(fetch(url.format(username, i + 1), session, {"username": username})) for i in range(num_pages)]
-        scrape_responses = await asyncio.gather(*tasks, return_exceptions=True)
-        # Filter out None responses and exceptions
-        scrape_responses = [x for x in scrape_responses if x is not None and not isinstance(x, Exception)]
+    # Users with the most pages last time go first so their pages are spread through the run
+    ordered_usernames = sorted(usernames, key=lambda u: user_state.get(u, {}).get("recent_page_count", 0), reverse=True)
+    jobs = deque((username, 1) for username in ordered_usernames)
 
-    if not scrape_responses:
-        print(f"No valid responses for user {username}, skipping...")
-        return [], []
+    refreshes = {}
+    seen_movies = set()
+    watermarks = {}
+    unchanged = 0
 
-    tasks = [asyncio.ensure_future(generate_ratings_operations(response, send_to_db=store_in_db, return_unrated=return_unrated)) for response in scrape_responses]
-    parse_responses = await asyncio.gather(*tasks, return_exceptions=True)
-    # Filter out exceptions
-    parse_responses = [x for x in parse_responses if not isinstance(x, Exception)]
+    pbar = tqdm(total=len(jobs), desc="Scraping rating pages")
 
-    if not store_in_db:
-        return list(chain.from_iterable(list(chain.from_iterable(parse_responses))))
+    def schedule(username, pages):
+        for page in pages:
+            jobs.append((username, page))
+            refreshes[username]["pending"] += 1
+            pbar.total += 1
 
-    if not parse_responses:
-        return [], []
+    async for (username, page), parsed in sliding_window(jobs, fetch_page, MAX_IN_FLIGHT):
+        pbar.update(1)
 
-    upsert_ratings_operations, upsert_movies_operations = zip(*parse_responses)
-    return list(chain.from_iterable(upsert_ratings_operations)), list(chain.from_iterable(upsert_movies_operations))
-
-async def get_ratings(usernames, db_cursor=None, mongo_db=None, store_in_db=True):
-    ratings_collection = mongo_db.ratings
-    movies_collection = mongo_db.movies
-
-    chunk_size = 10
-    total_chunks = math.ceil(len(usernames) / chunk_size)
-
-    for chunk_index in range(total_chunks):
-        tasks = []
-        db_ratings_operations = []
-        db_movies_operations = []
-
-        start_index = chunk_size * chunk_index
-        end_index = min(start_index + chunk_size, len(usernames))
-        username_chunk = usernames[start_index:end_index]
-
-        for username in username_chunk:
-            task = asyncio.ensure_future(
-                get_user_ratings(
-                    username,
-                    db_cursor=db_cursor,
-                    mongo_db=mongo_db,
-                    store_in_db=store_in_db,
-                )
-            )
-            tasks.append(task)
-
-        user_responses = await asyncio.gather(*tasks)
-        for response in user_responses:
-            db_ratings_operations.extend(response[0])
-            db_movies_operations.extend(response[1])
+        if page == 1:
+            if parsed is None or parsed[0] == -1:
+                continue
+            num_pages, _, page_ratings = parsed
+
+            user = user_state.setdefault(username, {"username": username})
+            recent_page_count = get_recent_page_count(num_pages, user.get("num_ratings_pages", 0))
+            user["num_ratings_pages"] = num_pages
+            user["recent_page_count"] = recent_page_count
+            if store_in_db:
+                await writer.put(db_cursor, [UpdateOne(
+                    {"username": username},
+                    {
+                        "$set": {
+                            "num_ratings_pages": num_pages,
+                            "recent_page_count": recent_page_count,
+                            "last_updated": datetime.datetime.now(),
+                        }
+                    },
+                    upsert=True,
+                )])
 
+            previous = user.get("ratings_watermark") or {}
+            fingerprint = page_fingerprint(page_ratings)
+            if fingerprint == previous.get("first_page_fingerprint"):
+                unchanged += 1
+                continue
+
+            refreshes[username] = {
+                "num_pages": num_pages,
+                "known_movie_id": previous.get("newest_movie_id"),
+                "watermark": {
+                    "newest_movie_id": page_ratings[0][0] if page_ratings else None,
+                    "first_page_fingerprint": fingerprint,
+                },
+                "pending": 0,
+                "failed": False,
+                # Loaded in a thread while the next pages are fetched
+                "snapshot": asyncio.ensure_future(asyncio.to_thread(load_rating_snapshot, mongo_db.ratings, username)) if store_in_db else None,
+            }
+            if refreshes[username]["known_movie_id"] is None:
+                schedule(username, range(2, recent_page_count + 1))
+        else:
+            refreshes[username]["pending"] -= 1
+            if parsed is None or parsed[0] == -1:
+                refreshes[username]["failed"] = True
+                page_ratings = []
+            else:
+                page_ratings = parsed[2]
+
+        refresh = refreshes[username]
+        known_movie_id = refresh["known_movie_id"]
+        page_movie_ids = [movie_id for movie_id, _ in page_ratings]
+
+        snapshot = None
         if store_in_db:
             try:
-                if db_ratings_operations:
-                    ratings_collection.bulk_write(db_ratings_operations, ordered=False)
+                snapshot = await refresh["snapshot"]
+            except Exception as e:
+                # Without the stored ratings nothing is written for the user, and the watermark is kept
+                print(f"Error loading stored ratings of {username}: {e!r}")
+                refresh["failed"] = True
+
+        if known_movie_id is not None and known_movie_id in page_movie_ids:
+            # Everything after the newest film of the last refresh is already stored. Page 1 is
+            # written whole, since its fingerprint may have changed because of a re-rating
+            # further down the page, which the snapshot diff picks up.
+            if page > 1:
+                page_ratings = page_ratings[:page_movie_ids.index(known_movie_id) + 1]
+        elif known_movie_id is not None and not refresh["failed"] and page < refresh["num_pages"]:
+            schedule(username, [page + 1])
+
+        if snapshot is not None:
+            ratings_ops, movie_ops = ratings_operations(username, [x for x in page_ratings if x[1] >= 0], snapshot, seen_movies)
+            await writer.put(mongo_db.ratings, ratings_ops, tag=username)
+            await writer.put(mongo_db.movies, movie_ops)
+
+        if refresh["pending"] == 0:
+            # The user's stored ratings are only needed while their pages come in
+            refresh["snapshot"] = None
+            if not refresh["failed"]:
+                watermarks[username] = refresh["watermark"]
+
+    pbar.close()
+
+    # Watermarks are only saved once the ratings they cover are in the database: users with a
+    # failed ratings write keep their previous watermark and are refreshed again next run
+    failed_users = await writer.flush() if store_in_db else set()
+    watermark_operations = []
+    for username, watermark in watermarks.items():
+        if username in failed_users:
+            continue
+        user_state[username]["ratings_watermark"] = watermark
+        watermark_operations.append(UpdateOne({"username": username}, {"$set": {"ratings_watermark": watermark}}))
 
-                if db_movies_operations:
-                    movies_collection.bulk_write(db_movies_operations, ordered=False)
+    print(f"Users refreshed: {len(refreshes)}, unchanged: {unchanged}, failed writes: {len(failed_users)}, pages: {pbar.n}")
 
-            except BulkWriteError as bwe:
-                pprint(bwe.details)
+    if store_in_db:
+        await writer.put(db_cursor, watermark_operations)
 
 def print_status(start, chunk_size, chunk_index, total_operations, total_records):
     total_time = round((time.time() - start), 2)
@@ -230,19 +348,17 @@ async def main_async():
     db = client[db_name]
     users = db.users
 
-    all_users = list(users.find({}).sort("last_updated", -1).limit(1200))
+    # One projected query loads the state of every user in the run; it is updated in place
+    all_users = list(users.find({}, USER_STATE_FIELDS).sort("last_updated", -1).limit(1200))
     all_usernames = [x["username"] for x in all_users]
+    user_state = {x["username"]: x for x in all_users}
 
-    large_chunk_size = 100
-    num_chunks = math.ceil(len(all_usernames) / large_chunk_size)
-
-    pbar = tqdm(range(num_chunks))
-    for chunk in pbar:
-        pbar.set_description(f"Scraping ratings data for user group {chunk+1} of {num_chunks}")
-        username_set = all_usernames[chunk * large_chunk_size: (chunk + 1) * large_chunk_size]
+    async with HttpClient() as http_client, BulkWriter() as writer:
+        await get_ratings(all_usernames, users, db, writer=writer, client=http_client, user_state=user_state)
 
-        await get_page_counts(username_set, users)
-        await get_ratings(username_set, users, db)
+    print("HTTP:", http_client.stats())
+    print("Bulk writer:", writer.stats())
+    print("MongoDB pool:", get_pool_stats())
 
 def main():
     asyncio.run(main_async())
@@ -5,81 +5,125 @@ import os
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(project_root)
 
-from bs4 import BeautifulSoup
-from pymongo import UpdateOne, ReplaceOne
 from pymongo.errors import BulkWriteError
-import requests
 import asyncio
 import datetime
 from pprint import pprint
 
-from db.db_connect import connect_to_db
-from scraping.get_ratings import get_user_ratings
-
-
-def get_page_count(username):
-    """Obtém o número de páginas de avaliações de um usuário."""
-    url = f"https://letterboxd.com/{username}/films/by/date"
-    r = requests.get(url)
-    soup = BeautifulSoup(r.text, "lxml")
-
-    body = soup.find("body")
-
-    try:
-        if "error" in body["class"]:
-            return -1, None
-    except KeyError:
-        print(body)
-        return -1, None
-
-    try:
-        page_link = soup.findAll("li", attrs={"class": "paginate-page"})[-1]
-        num_pages = int(page_link.find("a").text.replace(",", ""))
-        display_name = (
-            body.find("section", attrs={"class": "profile-header"})
-            .find("h1", attrs={"class": "title-3"})
-            .text.strip()
+from db.db_connect import get_db
+from db.change_detection import load_rating_snapshot, changed_rating_operations, skeleton_movie_operations
+from scraping.get_ratings import fetch, stream_user_ratings
+from scraping.extract import extract_first_page
+from scraping.http_client import HttpClient
+from scraping.user_ratings_cache import UserRatingsCache, merge_ratings
+
+
+async def get_first_page(username, client):
+    """
+    Busca a primeira página de avaliações do usuário, da qual saem o número de páginas,
+    o nome de exibição e as avaliações mais recentes.
+
+    Retorna:
+        tuple: (num_pages, display_name, ratings), com num_pages -1 se o usuário não existir.
+    """
+    url = f"https://letterboxd.com/{username}/films/by/date/page/1/"
+    content, _ = await fetch(url, client)
+    if content is None:
+        raise ConnectionError(f"Não foi possível obter a página de avaliações de {username}")
+
+    # A extração é CPU-bound e roda fora do event loop
+    loop = asyncio.get_running_loop()
+    num_pages, display_name, page_ratings = await loop.run_in_executor(None, extract_first_page, content, True)
+    ratings = [{"movie_id": movie_id, "rating_val": rating_val, "user_id": username} for movie_id, rating_val in page_ratings]
+    return num_pages, display_name, ratings
+
+
+async def get_pages_ratings(username, pages, client):
+    """Coleta as avaliações das páginas informadas, reaproveitando o cliente HTTP."""
+    ratings = []
+    async for page_ratings, _ in stream_user_ratings(username, pages, client, send_to_db=False, return_unrated=True):
+        ratings.extend(page_ratings)
+    return ratings
+
+
+async def get_new_user_ratings(username, num_pages, cached_ratings, first_page_ratings, client, batch_size=4):
+    """
+    Coleta as páginas de avaliações em ordem de data até encontrar avaliações que já estão no cache.
+    A primeira página já foi baixada; as seguintes são buscadas em lotes de `batch_size`.
+    """
+    known = {x["movie_id"]: x["rating_val"] for x in cached_ratings}
+    new_ratings = list(first_page_ratings)
+
+    if any(known.get(x["movie_id"]) == x["rating_val"] for x in first_page_ratings):
+        return new_ratings
+
+    for first_page in range(2, num_pages + 1, batch_size):
+        pages = range(first_page, min(first_page + batch_size, num_pages + 1))
+        batch = await get_pages_ratings(username, pages, client)
+        new_ratings.extend(batch)
+
+        if any(known.get(x["movie_id"]) == x["rating_val"] for x in batch):
+            break
+
+    return new_ratings
+
+
+async def scrape_user_data_async(username, cached=None):
+    """
+    Coleta as avaliações do usuário com um único cliente HTTP. A primeira página é baixada uma
+    só vez e fornece o número de páginas, o nome de exibição e as primeiras avaliações; as demais
+    páginas são buscadas em seguida. Com uma entrada em cache, só busca as páginas mais recentes
+    até alcançar avaliações já conhecidas.
+
+    Retorna:
+        dict: Entrada com "ratings", "display_name" e "num_pages", ou None se o usuário não existir.
+    """
+    async with HttpClient() as client:
+        num_pages, display_name, first_page_ratings = await get_first_page(username, client)
+
+        if num_pages == -1:
+            return None
+
+        if cached is None:
+            ratings = first_page_ratings + await get_pages_ratings(username, range(2, num_pages + 1), client)
+        else:
+            new_ratings = await get_new_user_ratings(username, num_pages, cached["ratings"], first_page_ratings, client)
+            ratings = merge_ratings(new_ratings, cached["ratings"])
+
+    return {"ratings": ratings, "display_name": display_name, "num_pages": num_pages}
+
+
+def scrape_user_data(username, cached=None):
+    """Versão síncrona de `scrape_user_data_async`, usada pelos trabalhos do RQ."""
+    return asyncio.run(scrape_user_data_async(username, cached))
+
+
+def get_user_data(username, data_opt_in=False, redis_conn=None):
+    """
+    Coleta as avaliações do usuário e as insere no banco de dados, se necessário.
+    Com uma conexão Redis, as avaliações ficam em cache e são atualizadas de forma incremental.
+    """
+    if redis_conn is not None:
+        entry = UserRatingsCache(redis_conn).get_or_refresh(
+            username, lambda cached: scrape_user_data(username, cached)
         )
-    except IndexError:
-        num_pages = 1
-        display_name = None
-
-    return num_pages, display_name
+    else:
+        entry = scrape_user_data(username)
 
-
-def get_user_data(username, data_opt_in=False):
-    """Coleta as avaliações do usuário e as insere no banco de dados, se necessário."""
-    num_pages, display_name = get_page_count(username)
-
-    if num_pages == -1:
+    if entry is None:
         return [], "user_not_found"
 
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    future = asyncio.ensure_future(
-        get_user_ratings(
-            username,
-            db_cursor=None,
-            mongo_db=None,
-            store_in_db=False,
-            num_pages=num_pages,
-            return_unrated=True,
-        )
-    )
-    loop.run_until_complete(future)
-
-    user_ratings = [x for x in future.result() if x["rating_val"] >= 0]
+    user_ratings = [x for x in entry["ratings"] if x["rating_val"] >= 0]
     if data_opt_in:
-        send_to_db(username, display_name, user_ratings=user_ratings)
+        send_to_db(username, entry["display_name"], user_ratings=user_ratings)
 
-    return future.result(), "success"
+    return entry["ratings"], "success"
 
 
 def send_to_db(username, display_name, user_ratings):
-    """Insere ou atualiza as avaliações do usuário no MongoDB."""
-    # Conecta ao MongoDB usando a função de conexão de db_connect.py
-    db_name, client, tmdb_key = connect_to_db()  # Desempacota a tupla
-    db = client[db_name]  # Acesse o banco de dados usando o client e db_name
+    """Insere ou atualiza no MongoDB as avaliações do usuário que são novas ou mudaram."""
+    # Usa o cliente MongoDB compartilhado pelo processo
+    db = get_db()
     users = db.users  # Coleção 'users'
     ratings = db.ratings  # Coleção 'ratings'
     movies = db.movies  # Coleção 'movies'
@@ -94,24 +138,12 @@ def send_to_db(username, display_name, user_ratings):
     # Atualiza ou insere os dados do usuário
     users.update_one({"username": user["username"]}, {"$set": user}, upsert=True)
 
-    # Prepara operações de upsert para avaliações e filmes
-    upsert_ratings_operations = []
-    upsert_movies_operations = []
-    for rating in user_ratings:
-        upsert_ratings_operations.append(
-            ReplaceOne(
-                {"user_id": username, "movie_id": rating["movie_id"]},
-                rating,
-                upsert=True,
-            )
-        )
-        upsert_movies_operations.append(
-            UpdateOne(
-                {"movie_id": rating["movie_id"]},
-                {"$set": {"movie_id": rating["movie_id"]}},
-                upsert=True,
-            )
-        )
+    # Só avaliações novas ou com nota diferente da gravada, e o esqueleto apenas dos filmes novos
+    snapshot = load_rating_snapshot(ratings, username)
+    upsert_ratings_operations, new_movie_ids = changed_rating_operations(
+        username, [(rating["movie_id"], rating["rating_val"]) for rating in user_ratings], snapshot
+    )
+    upsert_movies_operations = skeleton_movie_operations(new_movie_ids)
 
     # Executa operações em lote para otimizar inserção e atualização
     try:
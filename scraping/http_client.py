@@ -0,0 +1,256 @@
+import sys
+import os
+
+# Adiciona o diretório raiz do projeto ao Python Path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+import json
+import time
+import random
+import asyncio
+import logging
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+from aiohttp import ClientSession, ClientTimeout, TCPConnector, ClientError
+
+from scraping.response_cache import ResponseCache
+
+logger = logging.getLogger(__name__)
+
+# Requisições por segundo permitidas por host. A taxa cai pela metade a cada 429 e volta
+# aos poucos até este valor conforme as respostas chegam sem erro.
+HOST_RATES = {
+    "letterboxd.com": float(os.getenv('SCRAPE_RATE_LETTERBOXD', 20)),
+    "api.themoviedb.org": float(os.getenv('SCRAPE_RATE_TMDB', 40)),
+}
+DEFAULT_RATE = float(os.getenv('SCRAPE_RATE_DEFAULT', 10))
+# Conexões abertas no total e por host
+MAX_CONNECTIONS = int(os.getenv('SCRAPE_MAX_CONNECTIONS', 64))
+MAX_PER_HOST = int(os.getenv('SCRAPE_MAX_PER_HOST', 16))
+# Novas tentativas por requisição, com espera exponencial com jitter a partir de RETRY_BASE segundos
+MAX_RETRIES = int(os.getenv('SCRAPE_MAX_RETRIES', 4))
+RETRY_BASE = float(os.getenv('SCRAPE_RETRY_BASE', 0.5))
+RETRY_MAX_DELAY = 30.0
+REQUEST_TIMEOUT = float(os.getenv('SCRAPE_REQUEST_TIMEOUT', 30))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Limita as requisições a um host a `rate` por segundo, com rajadas de até `rate` requisições."""
+
+    def __init__(self, rate):
+        self.max_rate = rate
+        self.min_rate = max(rate / 16, 0.5)
+        self.rate = rate
+        self.capacity = max(rate, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Espera até haver uma ficha disponível. As requisições são atendidas em ordem de chegada."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def throttle(self, delay):
+        """
+        Resposta 429: pausa o host por `delay` segundos e reduz a taxa pela metade. As fichas
+        voltam a ser repostas só depois da pausa, e a rajada máxima acompanha a nova taxa.
+        """
+        self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.capacity = max(self.rate, 1)
+        self.tokens = 0
+        self.updated = self.blocked_until
+
+    def recover(self):
+        """Resposta sem erro: aumenta a taxa (e a rajada máxima) aos poucos até o máximo do host."""
+        if self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 100)
+            self.capacity = max(self.rate, 1)
+
+
+def retry_delay(attempt):
+    """Espera antes da tentativa `attempt` + 1: exponencial com jitter completo."""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE * 2 ** attempt))
+
+
+def parse_retry_after(value):
+    """Lê o cabeçalho Retry-After, em segundos ou como data HTTP. Retorna None se ausente ou inválido."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class HttpClient:
+    """
+    Cliente HTTP compartilhado pelos scrapers.
+
+    Cada host tem um token bucket próprio (HOST_RATES) que se adapta às respostas 429. Falhas
+    de conexão, timeouts, 429 e 5xx são repetidos por requisição, respeitando o Retry-After,
+    de modo que uma URL com falha não obriga a baixar de novo as que já deram certo. Outras
+    respostas, inclusive 404, são devolvidas como vieram. O connector mantém as conexões
+    abertas (keep-alive) e guarda as consultas de DNS.
+
+    Com um ResponseCache (por padrão o de SCRAPE_CACHE_MODE), respostas dentro do TTL vêm do
+    disco sem acessar a rede, as vencidas são revalidadas com ETag/Last-Modified e, no modo
+    replay, só o cache é usado.
+
+    Uso:
+        async with HttpClient() as client:
+            content = await client.get(url)
+    """
+
+    def __init__(self, host_rates=None, max_connections=MAX_CONNECTIONS, max_per_host=MAX_PER_HOST, max_retries=MAX_RETRIES, timeout=REQUEST_TIMEOUT, cache=None):
+        self.host_rates = {**HOST_RATES, **(host_rates or {})}
+        self.cache = cache if cache is not None else ResponseCache.from_env()
+        self.max_connections = max_connections
+        self.max_per_host = max_per_host
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.session = None
+        self._buckets = {}
+        self._stats = {}
+
+    async def __aenter__(self):
+        connector = TCPConnector(
+            limit=self.max_connections,
+            limit_per_host=self.max_per_host,
+            ttl_dns_cache=300,
+            keepalive_timeout=30,
+        )
+        self.session = ClientSession(connector=connector, timeout=ClientTimeout(total=self.timeout))
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.session.close()
+
+    def _bucket(self, host):
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            rate = next((r for suffix, r in self.host_rates.items() if host == suffix or host.endswith("." + suffix)), DEFAULT_RATE)
+            bucket = self._buckets[host] = TokenBucket(rate)
+        return bucket
+
+    def _host_stats(self, host):
+        stats = self._stats.get(host)
+        if stats is None:
+            stats = self._stats[host] = {
+                "requests": 0, "successes": 0, "failures": 0, "retries": 0, "throttled": 0,
+                "cache_hits": 0, "not_modified": 0, "latency_seconds": 0.0,
+            }
+        return stats
+
+    async def get(self, url, as_json=False):
+        """
+        Faz um GET com limite de taxa, novas tentativas e, se configurado, cache em disco.
+
+        Parâmetros:
+            url (str): URL da requisição.
+            as_json (bool): Decodifica a resposta como JSON.
+
+        Retorna:
+            bytes | dict: Corpo da resposta, ou None se todas as tentativas falharem.
+        """
+        body = await self._get(url)
+        if body is None or not as_json:
+            return body
+        try:
+            return json.loads(body)
+        except ValueError as e:
+            logger.warning(f"Resposta inválida de {url}: {e}")
+            return None
+
+    async def _get(self, url):
+        host = urlsplit(url).hostname or ""
+        stats = self._host_stats(host)
+
+        entry = None
+        if self.cache is not None:
+            entry = await asyncio.to_thread(self.cache.lookup, url)
+            if entry is not None and (self.cache.replay or self.cache.is_fresh(entry, url)):
+                stats["cache_hits"] += 1
+                return entry["body"]
+            if self.cache.replay:
+                stats["failures"] += 1
+                logger.warning(f"Sem resposta gravada para {url} no modo replay")
+                return None
+
+        bucket = self._bucket(host)
+        headers = self.cache.conditional_headers(entry) if entry is not None else {}
+
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                stats["retries"] += 1
+
+            await bucket.acquire()
+            stats["requests"] += 1
+            started = time.perf_counter()
+            try:
+                async with self.session.get(url, headers=headers) as response:
+                    if response.status in RETRY_STATUSES:
+                        delay = parse_retry_after(response.headers.get("Retry-After"))
+                        if response.status == 429:
+                            stats["throttled"] += 1
+                            bucket.throttle(delay if delay is not None else retry_delay(attempt))
+                        error = f"HTTP {response.status}"
+                    else:
+                        if response.status == 304 and entry is not None:
+                            stats["not_modified"] += 1
+                            body = entry["body"]
+                            await asyncio.to_thread(self.cache.touch, url, entry, response.headers)
+                        else:
+                            body = await response.read()
+                            if response.status == 200 and self.cache is not None:
+                                await asyncio.to_thread(self.cache.store, url, body, response.headers)
+                        stats["successes"] += 1
+                        stats["latency_seconds"] += time.perf_counter() - started
+                        bucket.recover()
+                        return body
+            except (ClientError, asyncio.TimeoutError) as e:
+                delay = None
+                error = repr(e)
+
+            if attempt < self.max_retries:
+                # O 429 já pausou o host; nos demais casos a espera é só desta requisição
+                await asyncio.sleep(delay if delay is not None else retry_delay(attempt))
+
+        stats["failures"] += 1
+        logger.warning(f"Desistindo de {url} após {self.max_retries + 1} tentativas: {error}")
+        return None
+
+    async def get_json(self, url):
+        """GET de uma API JSON. Retorna None se todas as tentativas falharem."""
+        return await self.get(url, as_json=True)
+
+    def stats(self):
+        """Contadores por host: requisições, sucessos, falhas, novas tentativas, 429, acertos do cache, 304, latência média e taxa atual."""
+        return {
+            host: {
+                **{k: v for k, v in stats.items() if k != "latency_seconds"},
+                "avg_latency_ms": round(stats["latency_seconds"] / stats["successes"] * 1000, 1) if stats["successes"] else 0.0,
+                "rate": round(self._buckets[host].rate, 2) if host in self._buckets else None,
+            }
+            for host, stats in self._stats.items()
+        }
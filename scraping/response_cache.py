@@ -0,0 +1,149 @@
+import sys
+import os
+
+# Adiciona o diretório raiz do projeto ao Python Path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+import re
+import json
+import time
+import hashlib
+import tempfile
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# off: sem cache; on: usa e grava o cache, revalidando respostas vencidas;
+# replay: responde só do cache, sem acessar a rede (testes e benchmarks offline)
+CACHE_MODES = ("off", "on", "replay")
+CACHE_MODE = os.getenv('SCRAPE_CACHE_MODE', 'off')
+CACHE_DIR = os.getenv('SCRAPE_CACHE_DIR', os.path.join(project_root, "data", "http_cache"))
+
+# Por quanto tempo (s) uma resposta é usada sem perguntar ao servidor, pela primeira regra que
+# casar com a URL. Depois disso ela é revalidada com ETag/Last-Modified.
+CACHE_TTLS = [
+    # Cada filme avaliado desloca todas as páginas de avaliações, não só a primeira, então
+    # elas são sempre revalidadas: páginas de momentos diferentes perderiam ou repetiriam
+    # os filmes que passaram de uma página para a outra
+    (re.compile(r"letterboxd\.com/[^/]+/films/by/date/page/\d+/$"), 0),
+    (re.compile(r"letterboxd\.com/members/popular/"), 24 * 3600),
+    (re.compile(r"letterboxd\.com/film/[^/]+/$"), 30 * 24 * 3600),
+    (re.compile(r"letterboxd\.com/ajax/poster/film/"), 30 * 24 * 3600),
+    (re.compile(r"api\.themoviedb\.org/3/movie/"), 7 * 24 * 3600),
+]
+
+# Parâmetros que não fazem parte da identidade da resposta e não devem ir para o disco
+IGNORED_PARAMS = {"api_key"}
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class ResponseCache:
+    """
+    Cache em disco das respostas HTTP dos scrapers, endereçado pelo conteúdo.
+
+    Os corpos ficam em `blobs/`, nomeados pelo SHA-256 do conteúdo, de modo que respostas
+    iguais ocupam um único arquivo. Cada URL tem uma entrada em `entries/` com o hash do corpo,
+    o ETag, o Last-Modified e o horário da última confirmação com o servidor.
+
+    Os métodos fazem I/O de disco e são chamados pelo HttpClient fora do event loop.
+    """
+
+    def __init__(self, directory=CACHE_DIR, mode="on", ttls=CACHE_TTLS):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Modo de cache inválido: {mode}. Use um de {CACHE_MODES}.")
+        self.directory = directory
+        self.mode = mode
+        self.ttls = ttls
+
+    @classmethod
+    def from_env(cls):
+        """Cache configurado por SCRAPE_CACHE_MODE e SCRAPE_CACHE_DIR, ou None se desativado."""
+        if CACHE_MODE == "off":
+            return None
+        return cls(CACHE_DIR, CACHE_MODE)
+
+    @property
+    def replay(self):
+        return self.mode == "replay"
+
+    def cache_url(self, url):
+        """URL usada como chave, sem os parâmetros de IGNORED_PARAMS (ex.: a chave da API do TMDb)."""
+        parts = urlsplit(url)
+        query = urlencode([(k, v) for k, v in parse_qsl(parts.query) if k not in IGNORED_PARAMS])
+        return urlunsplit(parts._replace(query=query))
+
+    def ttl_for(self, url):
+        return next((ttl for pattern, ttl in self.ttls if pattern.search(url)), 0)
+
+    def _entry_path(self, url):
+        key = _digest(self.cache_url(url).encode())
+        return os.path.join(self.directory, "entries", key[:2], f"{key}.json")
+
+    def _blob_path(self, blob):
+        return os.path.join(self.directory, "blobs", blob[:2], blob)
+
+    def lookup(self, url):
+        """
+        Busca a resposta gravada para a URL.
+
+        Retorna:
+            dict: Entrada com "body", "etag", "last_modified" e "checked_at", ou None se não houver.
+        """
+        try:
+            with open(self._entry_path(url), "rb") as f:
+                entry = json.loads(f.read())
+            with open(self._blob_path(entry["blob"]), "rb") as f:
+                entry["body"] = f.read()
+        except (OSError, ValueError, KeyError):
+            return None
+        return entry
+
+    def is_fresh(self, entry, url):
+        """Se a entrada ainda está dentro do TTL da URL e pode ser usada sem revalidar."""
+        return time.time() - entry["checked_at"] < self.ttl_for(url)
+
+    def conditional_headers(self, entry):
+        """Cabeçalhos para revalidar a entrada: o servidor responde 304 se nada mudou."""
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, url, body, headers):
+        """Grava uma resposta 200 para a URL."""
+        blob = _digest(body)
+        blob_path = self._blob_path(blob)
+        if not os.path.exists(blob_path):
+            _write_atomic(blob_path, body)
+
+        entry = {
+            "url": self.cache_url(url),
+            "blob": blob,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "checked_at": time.time(),
+        }
+        _write_atomic(self._entry_path(url), json.dumps(entry).encode())
+
+    def touch(self, url, entry, headers):
+        """Resposta 304: a entrada continua válida e volta a contar o TTL."""
+        self.store(url, entry["body"], {
+            "ETag": headers.get("ETag") or entry.get("etag"),
+            "Last-Modified": headers.get("Last-Modified") or entry.get("last_modified"),
+        })
@@ -0,0 +1,144 @@
+import sys
+import os
+
+# Adiciona o diretório raiz do projeto ao Python Path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+import json
+import time
+import hashlib
+import logging
+
+from redis.exceptions import LockError
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY = "user_ratings:{}"
+DIGEST_KEY = "user_ratings_digest:{}"
+LOCK_KEY = "user_ratings_lock:{}"
+# Tempo que as avaliações ficam guardadas para servir de base ao scraping incremental
+CACHE_TTL = int(os.environ.get('USER_RATINGS_CACHE_TTL', 30 * 24 * 3600))
+# Dentro desta janela as avaliações em cache são usadas sem consultar o Letterboxd
+FRESH_SECONDS = int(os.environ.get('USER_RATINGS_FRESH_SECONDS', 300))
+# Tempo máximo de um scraping e de espera por um scraping em andamento do mesmo usuário
+LOCK_TIMEOUT = int(os.environ.get('USER_RATINGS_LOCK_TIMEOUT', 180))
+
+
+def ratings_digest(ratings):
+    """Calcula um hash das avaliações do usuário, independente da ordem."""
+    pairs = sorted((x["movie_id"], x["rating_val"]) for x in ratings)
+    return hashlib.sha1(json.dumps(pairs).encode()).hexdigest()
+
+
+def merge_ratings(new_ratings, cached_ratings):
+    """Combina as avaliações recém-coletadas com as do cache, priorizando as novas."""
+    new_ids = {x["movie_id"] for x in new_ratings}
+    return new_ratings + [x for x in cached_ratings if x["movie_id"] not in new_ids]
+
+
+def _decode_digest(value):
+    return value.decode() if value else None
+
+
+async def get_digest_async(async_conn, username):
+    """Mesmo que `UserRatingsCache.get_digest`, em uma conexão assíncrona do Redis."""
+    try:
+        value = await async_conn.get(DIGEST_KEY.format(username))
+    except Exception as e:
+        logger.error(f"Erro ao ler hash das avaliações de {username}: {str(e)}")
+        return None
+    return _decode_digest(value)
+
+
+class UserRatingsCache:
+    """
+    Cache das avaliações coletadas de cada usuário no Redis.
+
+    Requisições simultâneas para o mesmo usuário são serializadas por um lock no Redis:
+    a primeira faz o scraping e as demais encontram o resultado recém-gravado no cache.
+    """
+
+    def __init__(self, redis_conn, ttl=CACHE_TTL, fresh_seconds=FRESH_SECONDS, lock_timeout=LOCK_TIMEOUT):
+        self.redis_conn = redis_conn
+        self.ttl = ttl
+        self.fresh_seconds = fresh_seconds
+        self.lock_timeout = lock_timeout
+
+    def get(self, username):
+        """Retorna a entrada do usuário no cache, ou None."""
+        try:
+            value = self.redis_conn.get(CACHE_KEY.format(username))
+        except Exception as e:
+            logger.error(f"Erro ao ler avaliações de {username} do cache: {str(e)}")
+            return None
+        return json.loads(value) if value else None
+
+    def get_digest(self, username):
+        """
+        Retorna o hash das avaliações do usuário sem ler as avaliações, ou None.
+        O hash só fica disponível enquanto as avaliações em cache estão frescas.
+        """
+        try:
+            value = self.redis_conn.get(DIGEST_KEY.format(username))
+        except Exception as e:
+            logger.error(f"Erro ao ler hash das avaliações de {username}: {str(e)}")
+            return None
+        return _decode_digest(value)
+
+    def set(self, username, entry):
+        """Grava a entrada do usuário no cache, com o horário do scraping e o hash das avaliações."""
+        entry = dict(entry, scraped_at=time.time(), digest=ratings_digest(entry["ratings"]))
+        try:
+            with self.redis_conn.pipeline() as pipe:
+                pipe.set(CACHE_KEY.format(username), json.dumps(entry), ex=self.ttl)
+                pipe.set(DIGEST_KEY.format(username), entry["digest"], ex=max(self.fresh_seconds, 1))
+                pipe.execute()
+        except Exception as e:
+            logger.error(f"Erro ao gravar avaliações de {username} no cache: {str(e)}")
+        return entry
+
+    def is_fresh(self, entry):
+        return entry is not None and time.time() - entry.get("scraped_at", 0) < self.fresh_seconds
+
+    def get_or_refresh(self, username, refresh):
+        """
+        Retorna as avaliações do usuário, atualizando o cache se necessário.
+
+        Parâmetros:
+            username (str): Nome do usuário.
+            refresh (callable): Recebe a entrada em cache (ou None) e retorna a entrada atualizada,
+                ou None se o usuário não existir.
+
+        Retorna:
+            dict: Entrada com "ratings", "display_name", "num_pages", "scraped_at" e "digest",
+                ou None se o usuário não existir.
+        """
+        cached = self.get(username)
+        if self.is_fresh(cached):
+            return cached
+
+        lock = self.redis_conn.lock(LOCK_KEY.format(username), timeout=self.lock_timeout)
+        try:
+            acquired = lock.acquire(blocking=True, blocking_timeout=self.lock_timeout)
+        except Exception as e:
+            logger.error(f"Erro ao obter lock de {username}: {str(e)}")
+            acquired = False
+
+        try:
+            # Outro processo pode ter atualizado o cache enquanto esperávamos o lock
+            if acquired:
+                cached = self.get(username)
+                if self.is_fresh(cached):
+                    return cached
+
+            entry = refresh(cached)
+            if entry is None:
+                return None
+            return self.set(username, entry)
+        finally:
+            if acquired:
+                try:
+                    lock.release()
+                except LockError:
+                    logger.warning(f"Lock de {username} expirou durante o scraping")
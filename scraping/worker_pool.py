@@ -0,0 +1,86 @@
+import sys
+import os
+
+# Adiciona o diretório raiz do projeto ao Python Path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+import asyncio
+import threading
+
+# Tarefas concorrentes dos scrapers de filmes; o ritmo real é dado pelo limite de taxa do HttpClient
+WORKERS = int(os.getenv('SCRAPE_WORKERS', 32))
+
+_END = object()
+
+
+async def iterate_in_thread(iterable, maxsize=1000):
+    """
+    Percorre um iterável síncrono (ex.: um cursor do pymongo) em uma thread e entrega os itens
+    ao event loop por uma fila limitada. O cursor busca os próximos lotes no banco enquanto os
+    itens anteriores são processados, sem bloquear o event loop nem carregar tudo em memória.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize)
+    stopped = threading.Event()
+
+    def produce():
+        error = None
+        try:
+            for item in iterable:
+                if stopped.is_set():
+                    break
+                asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+        except Exception as e:
+            error = e
+        asyncio.run_coroutine_threadsafe(queue.put((_END, error)), loop).result()
+
+    producer = loop.run_in_executor(None, produce)
+    try:
+        while True:
+            item = await queue.get()
+            if isinstance(item, tuple) and item and item[0] is _END:
+                if item[1] is not None:
+                    raise item[1]
+                return
+            yield item
+    finally:
+        # Libera a thread caso ela esteja esperando espaço na fila
+        stopped.set()
+        while not producer.done():
+            while not queue.empty():
+                queue.get_nowait()
+            await asyncio.sleep(0.01)
+
+
+async def run_workers(items, handle, workers=WORKERS):
+    """
+    Processa os itens de um iterável assíncrono com `workers` tarefas concorrentes.
+
+    Cada tarefa pega o próximo item assim que termina o anterior, então um item lento não
+    segura os demais. Erros de um item são registrados e não interrompem os outros.
+
+    Parâmetros:
+        items: Iterável assíncrono com os itens a processar.
+        handle: Corrotina chamada com cada item.
+        workers (int): Número de tarefas concorrentes.
+    """
+    queue = asyncio.Queue(workers * 2)
+
+    async def worker():
+        while (item := await queue.get()) is not _END:
+            try:
+                await handle(item)
+            except Exception as e:
+                print(f"Erro processando {item}: {e!r}")
+
+    tasks = [asyncio.ensure_future(worker()) for _ in range(workers)]
+    try:
+        async for item in items:
+            await queue.put(item)
+        for _ in tasks:
+            await queue.put(_END)
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,58 @@
+import sys
+import os
+
+# Adiciona o diretório raiz do projeto ao Python Path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+import glob
+
+import pytest
+
+from scraping import extract
+from scraping.benchmark_extract import EXTRACTORS, FIXTURES_DIR
+
+FIXTURES = [
+    (kind, path)
+    for kind in EXTRACTORS
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, kind, "*.html")))
+]
+
+
+def read_fixture(kind, name):
+    with open(os.path.join(FIXTURES_DIR, kind, name), "rb") as f:
+        return f.read()
+
+
+def test_fixtures_cover_every_extractor():
+    assert {kind for kind, _ in FIXTURES} == set(EXTRACTORS)
+
+
+@pytest.mark.parametrize("kind,path", FIXTURES, ids=[f"{kind}/{os.path.basename(path)}" for kind, path in FIXTURES])
+def test_extract_matches_beautifulsoup(kind, path):
+    with open(path, "rb") as f:
+        content = f.read()
+    soup_func, lxml_func = EXTRACTORS[kind]
+
+    assert lxml_func(content) == soup_func(content)
+    # Páginas recebidas como str passam pelo parser UTF-8 e devem dar o mesmo resultado
+    assert lxml_func(content.decode("utf-8")) == soup_func(content)
+
+
+def test_ratings_include_unrated_films():
+    ratings = extract.extract_ratings(read_fixture("ratings", "rated_and_unrated.html"), return_unrated=True)
+    assert ratings[:3] == [("amelie", 9), ("la-haine", 8), ("spirited-away", -1)]
+    assert ("spirited-away", -1) not in extract.extract_ratings(read_fixture("ratings", "rated_and_unrated.html"))
+
+
+def test_profiles():
+    assert extract.extract_profile(read_fixture("profile", "with_pagination.html")) == (1204, "Cinéphile Zoë")
+    assert extract.extract_profile(read_fixture("profile", "without_pagination.html")) == (1, None)
+    assert extract.extract_profile(read_fixture("profile", "error.html")) == (-1, None)
+
+
+def test_film_and_poster():
+    film = extract.extract_film(read_fixture("film", "amelie.html"))
+    assert (film["movie_title"], film["year_released"], film["imdb_id"], film["tmdb_id"]) == ("Amélie", 2001, "tt0211915", "194")
+    assert extract.extract_image_url(read_fixture("poster", "amelie.html")) == "film-poster/5/1/5/6/8/51568-amelie-0-230-0-345-crop"
+    assert extract.extract_image_url(read_fixture("poster", "no_poster.html")) == ""
@@ -0,0 +1,136 @@
+import sys
+import os
+
+# Adiciona o diretório raiz do projeto ao Python Path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+import asyncio
+import re
+
+import pytest
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from scraping import get_ratings as gr
+
+PAGE_SIZE = 5
+PAGE_URL = re.compile(r"letterboxd\.com/([^/]+)/films/by/date/page/(\d+)/")
+
+
+def render_page(library, username, page):
+    """films/by/date page of a user, newest first, with the markup extract.py reads."""
+    films = library[username][(page - 1) * PAGE_SIZE:page * PAGE_SIZE]
+    num_pages = max(1, -(-len(library[username]) // PAGE_SIZE))
+    items = "".join(
+        f'<li class="poster-container"><div class="film-poster" data-target-link="/film/{movie_id}/"></div>'
+        f'<p class="poster-viewingdata"><span class="rating -micro rated-{rating}"></span></p></li>'
+        for movie_id, rating in films
+    )
+    pages = "".join(f'<li class="paginate-page"><a>{n}</a></li>' for n in range(1, num_pages + 1)) if num_pages > 1 else ""
+    return f'<html><body class="profile-page"><ul>{items}</ul><div class="paginate-pages"><ul>{pages}</ul></div></body></html>'
+
+
+class FakeCollection:
+    """Ratings/movies/users collection keeping upserted ratings, with an optional write failure."""
+
+    def __init__(self, full_name, store):
+        self.full_name = full_name
+        self.store = store
+        self.fail = None
+        self.operations = []
+
+    def find(self, query, projection=None):
+        return [
+            {"movie_id": movie_id, "rating_val": rating_val}
+            for (user_id, movie_id), rating_val in self.store.items()
+            if user_id == query["user_id"]
+        ]
+
+    def bulk_write(self, operations, ordered=False):
+        self.operations.extend(operations)
+        failed = [i for i, op in enumerate(operations) if self.fail and self.fail(op)]
+        for i, op in enumerate(operations):
+            fields = op._doc.get("$set", {})
+            if i not in failed and "rating_val" in fields:
+                self.store[(fields["user_id"], fields["movie_id"])] = fields["rating_val"]
+        if failed and self.fail is FAIL_ALL:
+            raise AutoReconnect("connection lost")
+        if failed:
+            raise BulkWriteError({"writeErrors": [{"index": i, "code": 11000, "errmsg": "E11000"} for i in failed]})
+
+
+def FAIL_ALL(op):
+    return True
+
+
+class FakeDB:
+    def __init__(self):
+        self.stored_ratings = {}
+        self.ratings = FakeCollection("db.ratings", self.stored_ratings)
+        self.movies = FakeCollection("db.movies", {})
+        self.users = FakeCollection("db.users", {})
+
+
+@pytest.fixture
+def library(monkeypatch):
+    library = {
+        "alice": [(f"a{i}", i % 10 + 1) for i in range(12)],
+        "bob": [(f"b{i}", i % 10 + 1) for i in range(7)],
+    }
+
+    async def fake_fetch(url, client, input_data=None):
+        username, page = PAGE_URL.search(url).groups()
+        return render_page(library, username, int(page)).encode(), input_data
+
+    monkeypatch.setattr(gr, "fetch", fake_fetch)
+    return library
+
+
+def refresh(db, user_state, usernames):
+    asyncio.run(gr.get_ratings(usernames, db.users, db, client=object(), user_state=user_state))
+
+
+def newest(user_state, username):
+    return user_state[username]["ratings_watermark"]["newest_movie_id"]
+
+
+def test_watermark_does_not_move_when_ratings_write_fails(library):
+    db = FakeDB()
+    user_state = {}
+    refresh(db, user_state, ["alice", "bob"])
+    assert newest(user_state, "alice") == "a0"
+    assert len(db.stored_ratings) == 19
+
+    library["alice"] = [("z1", 7), ("z2", 8)] + library["alice"]
+    library["bob"] = [("y1", 5)] + library["bob"]
+    db.ratings.fail = FAIL_ALL
+    refresh(db, user_state, ["alice", "bob"])
+
+    assert newest(user_state, "alice") == "a0"
+    assert newest(user_state, "bob") == "b0"
+    assert ("alice", "z1") not in db.stored_ratings
+
+    # The next run retries the users whose ratings were not written
+    db.ratings.fail = None
+    refresh(db, user_state, ["alice", "bob"])
+    assert newest(user_state, "alice") == "z1"
+    assert db.stored_ratings[("alice", "z1")] == 7
+    assert db.stored_ratings[("alice", "z2")] == 8
+    assert db.stored_ratings[("bob", "y1")] == 5
+
+
+def test_only_users_with_failed_writes_keep_their_watermark(library):
+    db = FakeDB()
+    user_state = {}
+    refresh(db, user_state, ["alice", "bob"])
+
+    library["alice"] = [("z1", 7)] + library["alice"]
+    library["bob"] = [("y1", 5)] + library["bob"]
+    db.ratings.fail = lambda op: op._filter["user_id"] == "alice"
+    db.users.operations.clear()
+    refresh(db, user_state, ["alice", "bob"])
+
+    assert newest(user_state, "alice") == "a0"
+    assert newest(user_state, "bob") == "y1"
+    watermark_writes = [op._filter["username"] for op in db.users.operations if "ratings_watermark" in op._doc["$set"]]
+    assert watermark_writes == ["bob"]
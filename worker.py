@@ -3,11 +3,17 @@ load_dotenv()  # Isso carrega as variáveis do arquivo .env
 
 import os
 import redis
-from rq import Worker, Queue
+import redis.asyncio
+from rq import Queue
 
 # Filas que o worker vai escutar
 listen = ['high', 'default', 'low']
 
+# Modo do worker: "cold" (Worker padrão do RQ, um processo por trabalho), "warm_fork" (fork a
+# partir de um processo pai já carregado) ou "warm" (sem fork, artefatos carregados uma vez; um
+# trabalho que trave ou corrompa o processo afeta todos os seguintes, por isso é opcional)
+worker_mode = os.environ.get('WORKER_MODE', 'cold')
+
 # Lê as variáveis de ambiente
 redis_host = os.environ.get('REDIS_HOST')
 redis_port = os.environ.get('REDIS_PORT')
@@ -32,9 +38,21 @@ conn = redis.Redis(
     password=redis_password,
 )
 
+# Conexão assíncrona usada pela API para pub/sub do progresso dos trabalhos
+async_conn = redis.asyncio.Redis(
+    host=redis_host,
+    port=redis_port,
+    username=redis_username,
+    password=redis_password,
+)
+
 if __name__ == '__main__':
-    print("Iniciando o worker RQ...")
+    from jobs.warm_worker import WORKER_CLASSES
+
+    print(f"Iniciando o worker RQ no modo {worker_mode}...")
     print(f"Conectando ao Redis em {redis_host}:{redis_port}")
     queues = [Queue(name, connection=conn) for name in listen]
-    worker = Worker(queues, connection=conn)
+    worker = WORKER_CLASSES[worker_mode](queues, connection=conn)
+    if hasattr(worker, 'preload'):
+        worker.preload()
     worker.work()
\ No newline at end of file